@@ -8,8 +8,23 @@
 # lrvic - https://github.com/lrvick/raspi-hd44780/blob/master/hd44780.py
 # LiquidCrystal - https://github.com/arduino/Arduino/blob/master/libraries/LiquidCrystal/LiquidCrystal.cpp
 
-from Adafruit_I2C import Adafruit_I2C
-from time import sleep
+from Adafruit_I2C import Adafruit_I2C, Arbiter
+from collections import OrderedDict
+from time import monotonic, sleep
+import json
+import os
+
+
+# Build the 256-entry table of 4-byte PORTB streams (high nybble with
+# strobe set and cleared, then low nybble likewise) for one bitmask.
+def encodeTable(flip, bitmask):
+    table = []
+    for value in range(256):
+        hi = bitmask | flip[value >> 4]
+        lo = bitmask | flip[value & 0x0F]
+        table.append(bytes((hi | 0b00100000, hi, lo | 0b00100000, lo)))
+    return tuple(table)
+
 
 class Adafruit_CharLCDPlate(Adafruit_I2C):
 
@@ -20,9 +35,17 @@ class Adafruit_CharLCDPlate(Adafruit_I2C):
     MCP23017_IOCON_BANK0    = 0x0A  # IOCON when Bank 0 active
     MCP23017_IOCON_BANK1    = 0x15  # IOCON when Bank 1 active
     # These are register addresses when in Bank 1 only:
+    MCP23017_IODIRA         = 0x00
+    MCP23017_IPOLA          = 0x01
+    MCP23017_GPINTENA       = 0x02
+    MCP23017_GPPUA          = 0x06
+    MCP23017_INTFA          = 0x07
+    MCP23017_INTCAPA        = 0x08
     MCP23017_GPIOA          = 0x09
+    MCP23017_OLATA          = 0x0A
     MCP23017_IODIRB         = 0x10
     MCP23017_GPIOB          = 0x19
+    MCP23017_OLATB          = 0x1A
 
     # Port expander input pin definitions
     SELECT                  = 0
@@ -72,61 +95,166 @@ class Adafruit_CharLCDPlate(Adafruit_I2C):
     LCD_MOVERIGHT   = 0x04
     LCD_MOVELEFT    = 0x00
 
+    # DDRAM geometry in 2-line mode: two lines of 40 cells each, line 1
+    # at addresses 0x00-0x27 and line 2 at 0x40-0x67.  The shadow copy
+    # used by framebuffer mode stores these as one linear 80-cell array.
+    DDRAM_COLS      = 40
+    DDRAM_SIZE      = 80
+
 
     # ----------------------------------------------------------------------
     # Constructor
 
-    def __init__(self, busnum=-1, addr=0x20, debug=False):
-
-        self.i2c = Adafruit_I2C(addr, busnum, debug)
+    def __init__(self, busnum=-1, addr=0x20, debug=False, timed=False,
+                 bus=None, latch=False, state=None):
+
+        # bus: see Adafruit_I2C, e.g. 'emulator' to run without the plate
+        self.i2c = Adafruit_I2C(addr, busnum, debug, bus, client='lcd')
+        # Button reads go ahead of LCD writes waiting for the bus, so a
+        # thread reading the buttons waits for one block write at most,
+        # not a whole frame
+        self.reader = self.i2c.client('input', Arbiter.HIGH)
+        # Timed mode's waits go by the bus's own clock where it has one
+        # (an SMBusEmulator in emulated time), and by real time otherwise
+        bus = self.i2c.arbiter.bus
+        self.monotonic = getattr(bus, 'monotonic', monotonic)
+        self.sleep     = getattr(bus, 'sleep', sleep)
 
         # I2C is relatively slow.  MCP output port states are cached
         # so we don't need to constantly poll-and-change bit states.
         self.porta, self.portb, self.ddrb = 0, 0, 0b00010000
+        self.color = self.ON  # All LEDs on (active low) until backlight()
+
+        # In timed mode, slow instructions are waited out against a
+        # deadline instead of polling the busy flag (see write()), and
+        # D7 stays an output throughout.
+        self.timed = timed
+        self.ready = 0.0
+        if timed:
+            self.ddrb  = 0b00000000
+            self.ready = self.monotonic() + self.LCD_SLOWDELAY
+
+        # With latch set, button changes are caught by the port expander's
+        # interrupt-on-change logic and read back with buttonStates().
+        self.latch = latch
+
+        # Shadow copy of DDRAM, kept current by write() whether or not
+        # framebuffer mode is on.  'hwaddr' is the controller's address
+        # counter, 'addr' the cursor position callers asked for (the two
+        # differ only while a framebuffer mode cursor move is pending).
+        self.shadow   = bytearray(b' ' * self.DDRAM_SIZE)
+        self.hwaddr   = 0
+        self.addr     = 0
+        self.cgmode   = False # True while writes go to CGRAM
+        self.shift    = 0     # DDRAM column shown at the display's left edge
+        self.fb       = False # Framebuffer (diff) mode for message()
+        self.fbSent   = 0     # Bytes actually sent by framebuffer mode
+        self.fbSaved  = 0     # Bytes a full redraw would have added
+        self.fbMoved  = False # A setCursor() is held back for message()
+        self.numlines = 2
+        self.numcols  = 16
+
+        # What each CGRAM slot holds, and when it was last used; see glyph()
+        self.cgram        = [None] * 8
+        self.cgramUsed    = [0] * 8
+        self.cgramTick    = 0
+        self.cgramUploads = 0
+        self.cgramSkips   = 0
+
+        # Scratch buffer for the nybble encoder and the encoded-frame cache
+        self.buf         = bytearray(4 * self.DDRAM_SIZE)
+        self.view        = memoryview(self.buf)
+        self.frames      = OrderedDict()
+        self.frameHits   = 0
+        self.frameMisses = 0
+
+        # Write-through copy of the output registers (see writeReg())
+        self.regs      = {}
+        self.regHits   = 0
+        self.regMisses = 0
+
+        # Frame batching (see beginFrame()) and I2C transaction counters.
+        # Button reads come from another thread (see readReg()), so they
+        # are counted apart, in 'reads', and don't land in a frame's count.
+        self.batch             = 0
+        self.pending           = bytearray()
+        self.transactions      = 0
+        self.reads             = 0
+        self.frameStart        = 0
+        self.frameBytes        = 0
+        self.frameTransactions = 0
+
+        # 'state' names a file the DDRAM and CGRAM contents are saved to
+        # after every frame (see saveState()), best kept on a tmpfs such
+        # as /run.  When the program restarts and finds the expander
+        # still configured by the last run (a power cycle or stop() puts
+        # it back in bank 0), the register reload and the clears are
+        # skipped and the saved frame is painted straight back instead,
+        # so a restart doesn't blank the screen.
+        self.state = state
+        self.saved = None
+        self.warm  = False
 
         # Set MCP23017 IOCON register to Bank 0 with sequential operation.
         # If chip is already set for Bank 0, this will just write to OLATB,
         # which won't seriously bother anything on the plate right now
         # (blue backlight LED will come on, but that's done in the next
         # step anyway).
-        self.i2c.bus.write_byte_data(
-          self.i2c.address, self.MCP23017_IOCON_BANK1, 0)
-
-        # Brute force reload ALL registers to known state.  This also
-        # sets up all the input pins, pull-ups, etc. for the Pi Plate.
-        self.i2c.bus.write_i2c_block_data(
-          self.i2c.address, 0, 
-          [ 0b00111111,   # IODIRA    R+G LEDs=outputs, buttons=inputs
-            self.ddrb ,   # IODIRB    LCD D7=input, Blue LED=output
-            0b00111111,   # IPOLA     Invert polarity on button inputs
-            0b00000000,   # IPOLB
-            0b00000000,   # GPINTENA  Disable interrupt-on-change
-            0b00000000,   # GPINTENB
-            0b00000000,   # DEFVALA
-            0b00000000,   # DEFVALB
-            0b00000000,   # INTCONA
-            0b00000000,   # INTCONB
-            0b00000000,   # IOCON
-            0b00000000,   # IOCON
-            0b00111111,   # GPPUA     Enable pull-ups on buttons
-            0b00000000,   # GPPUB
-            0b00000000,   # INTFA
-            0b00000000,   # INTFB
-            0b00000000,   # INTCAPA
-            0b00000000,   # INTCAPB
-            self.porta,   # GPIOA
-            self.portb,   # GPIOB
-            self.porta,   # OLATA     0 on all outputs; side effect of
-            self.portb ]) # OLATB     turning on R+G+B backlight LEDs.
-
-        # Switch to Bank 1 and disable sequential operation.
-        # From this point forward, the register addresses do NOT match
-        # the list immediately above.  Instead, use the constants defined
-        # at the start of the class.  Also, the address register will no
-        # longer increment automatically after this -- multi-byte
-        # operations must be broken down into single-byte calls.
-        self.i2c.bus.write_byte_data(
-          self.i2c.address, self.MCP23017_IOCON_BANK0, 0b10100000)
+        # Nothing else may use the bus until it's back in bank 1.
+        with self.i2c.hold():
+            self.warm = self.configured()
+            if not self.warm:
+                self.i2c.bus.write_byte_data(
+                  self.i2c.address, self.MCP23017_IOCON_BANK1, 0)
+
+                # Brute force reload ALL registers to known state.  This
+                # also sets up all the input pins, pull-ups, etc. for the
+                # Pi Plate.
+                self.i2c.bus.write_i2c_block_data(
+                  self.i2c.address, 0, 
+                  [ 0b00111111,   # IODIRA    R+G LEDs=outputs, buttons=inputs
+                    self.ddrb ,   # IODIRB    LCD D7=input, Blue LED=output
+                    0b00111111,   # IPOLA     Invert polarity on button inputs
+                    0b00000000,   # IPOLB
+                    0b00011111 if latch else 0,
+                                  # GPINTENA  Interrupt-on-change on buttons
+                    0b00000000,   # GPINTENB
+                    0b00000000,   # DEFVALA
+                    0b00000000,   # DEFVALB
+                    0b00000000,   # INTCONA   ...compared with previous state
+                    0b00000000,   # INTCONB
+                    0b00000000,   # IOCON
+                    0b00000000,   # IOCON
+                    0b00111111,   # GPPUA     Enable pull-ups on buttons
+                    0b00000000,   # GPPUB
+                    0b00000000,   # INTFA
+                    0b00000000,   # INTFB
+                    0b00000000,   # INTCAPA
+                    0b00000000,   # INTCAPB
+                    self.porta,   # GPIOA
+                    self.portb,   # GPIOB
+                    self.porta,   # OLATA     0 on all outputs; side effect of
+                    self.portb ]) # OLATB     turning on R+G+B backlight LEDs.
+
+                # Switch to Bank 1 and disable sequential operation.
+                # From this point forward, the register addresses do NOT
+                # match the list immediately above.  Instead, use the
+                # constants defined at the start of the class.  Also, the
+                # address register will no longer increment automatically
+                # after this -- multi-byte operations must be broken down
+                # into single-byte calls.
+                self.i2c.bus.write_byte_data(
+                  self.i2c.address, self.MCP23017_IOCON_BANK0, 0b10100000)
+        self.resync()
+
+        if self.warm:
+            # Carry on with the backlight as the last run left it, and
+            # set up whatever this run does differently
+            self.porta = self.regs.get(self.MCP23017_OLATA, 0) & 0b11000000
+            self.portb = self.regs.get(self.MCP23017_OLATB, 0) & 0b00000001
+            self.color = ~((self.porta >> 6) | (self.portb << 2)) & 0b111
+            self.writeReg(self.MCP23017_IODIRB, self.ddrb)
+            self.writeReg(self.MCP23017_GPINTENA, 0b00011111 if latch else 0)
 
         self.displayshift   = (self.LCD_CURSORMOVE |
                                self.LCD_MOVERIGHT)
@@ -136,14 +264,22 @@ class Adafruit_CharLCDPlate(Adafruit_I2C):
                                self.LCD_CURSOROFF |
                                self.LCD_BLINKOFF)
 
+        # The init sequence gets the LCD into 4-bit mode whatever mode
+        # (or half way through which byte) it was in, so it's sent on a
+        # warm start too; it leaves the display contents alone.
         self.write(0x33) # Init
         self.write(0x32) # Init
         self.write(0x28) # 2 line 5x8 matrix
-        self.write(self.LCD_CLEARDISPLAY)
+        saved = self.loadState() if self.warm else None
+        if saved is None:
+            self.warm = False
+            self.write(self.LCD_CLEARDISPLAY)
         self.write(self.LCD_CURSORSHIFT    | self.displayshift)
         self.write(self.LCD_ENTRYMODESET   | self.displaymode)
         self.write(self.LCD_DISPLAYCONTROL | self.displaycontrol)
         self.write(self.LCD_RETURNHOME)
+        if saved is not None:
+            self.repaint(saved)
 
 
     # ----------------------------------------------------------------------
@@ -158,14 +294,60 @@ class Adafruit_CharLCDPlate(Adafruit_I2C):
              0b00000010, 0b00010010, 0b00001010, 0b00011010,
              0b00000110, 0b00010110, 0b00001110, 0b00011110 )
 
+    # out4() for every byte value, precomputed for each combination of
+    # the two PORTB bits that carry through a write: RS (bit 7, set for
+    # data) and the blue backlight LED (bit 0).
+    encoded = { 0b00000000 : encodeTable(flip, 0b00000000),
+                0b00000001 : encodeTable(flip, 0b00000001),
+                0b10000000 : encodeTable(flip, 0b10000000),
+                0b10000001 : encodeTable(flip, 0b10000001) }
+
     # Low-level 4-bit interface for LCD output.  This doesn't actually
     # write data, just returns a byte array of the PORTB state over time.
     # Can concatenate the output of multiple calls (up to 8) for more
     # efficient batch write.
     def out4(self, bitmask, value):
-        hi = bitmask | self.flip[value >> 4]
-        lo = bitmask | self.flip[value & 0x0F]
-        return [hi | 0b00100000, hi, lo | 0b00100000, lo]
+        return list(self.encoded[bitmask][value])
+
+
+    # Encode a string, bytes or list into PORTB streams, split into the
+    # 32-byte lists that I2C block writes (and smbus) want.  Encoding
+    # goes through the lookup tables into a preallocated buffer, so the
+    # only allocations are the final chunk lists.  Strings and bytes are
+    # common repeats (station banners, menu rows) and their encodings
+    # are kept in a small LRU cache.
+    FRAME_CACHE = 32
+
+    def chunks(self, value, bitmask):
+        key = None
+        if isinstance(value, (str, bytes)):
+            key    = (value, bitmask)
+            chunks = self.frames.get(key)
+            if chunks is not None:
+                self.frames.move_to_end(key)
+                self.frameHits += 1
+                return chunks
+            self.frameMisses += 1
+            if isinstance(value, str):
+                value = value.encode('latin-1', 'replace')
+
+        n = 4 * len(value)
+        if n > len(self.buf):
+            self.buf  = bytearray(n)
+            self.view = memoryview(self.buf)
+        buf, table, j = self.buf, self.encoded[bitmask], 0
+        for v in value:
+            buf[j:j + 4] = table[v]
+            j += 4
+        view   = self.view
+        chunks = tuple(view[i:min(i + 32, n)].tolist()
+                       for i in range(0, n, 32))
+
+        if key is not None:
+            self.frames[key] = chunks
+            if len(self.frames) > self.FRAME_CACHE:
+                self.frames.popitem(last=False)
+        return chunks
 
 
     # The speed of LCD accesses is inherently limited by I2C through the
@@ -180,7 +362,20 @@ class Adafruit_CharLCDPlate(Adafruit_I2C):
     # startup, and polling will then occur before more commands or data
     # are issued.
 
+    # Timed mode (the 'timed' constructor argument) takes the other
+    # approach for those too: it notes when a clear or home was issued
+    # and, before anything else goes out, sleeps away whatever is left
+    # of the datasheet's 1.52 ms execution time.  Callers are free to do
+    # other work in the meantime, including queueing up a frame, and no
+    # direction register changes or read-back transfers are needed.
+
     pollables = ( LCD_CLEARDISPLAY, LCD_RETURNHOME )
+    LCD_SLOWDELAY = 0.00152 # Clear/home execution time, seconds
+
+    # Timed mode: wait until any slow instruction has completed.
+    def settle(self):
+        wait = self.ready - self.monotonic()
+        if wait > 0: self.sleep(wait)
 
     # Write byte, list or string value to LCD
     def write(self, value, char_mode=False):
@@ -190,68 +385,280 @@ class Adafruit_CharLCDPlate(Adafruit_I2C):
         if self.ddrb & 0b00010000:
             lo = (self.portb & 0b00000001) | 0b01000000
             hi = lo | 0b00100000 # E=1 (strobe)
-            self.i2c.bus.write_byte_data(
-              self.i2c.address, self.MCP23017_GPIOB, lo)
-            while True:
-                # Strobe high (enable)
-                self.i2c.bus.write_byte(self.i2c.address, hi)
-                # First nybble contains busy state
-                bits = self.i2c.bus.read_byte(self.i2c.address)
-                # Strobe low, high, low.  Second nybble (A3) is ignored.
-                self.i2c.bus.write_i2c_block_data(
-                  self.i2c.address, self.MCP23017_GPIOB, [lo, hi, lo])
-                if (bits & 0b00000010) == 0: break # D7=0, not busy
+            self.writeReg(self.MCP23017_GPIOB, lo)
+            try:
+                while True:
+                    # read_byte() reads wherever write_byte() left the
+                    # address pointer, so nothing may come in between.
+                    with self.i2c.hold():
+                        # Strobe high (enable)
+                        self.i2c.bus.write_byte(self.i2c.address, hi)
+                        # First nybble contains busy state
+                        bits = self.i2c.bus.read_byte(self.i2c.address)
+                        # Strobe low, high, low.  Second nybble (A3) is
+                        # ignored.
+                        self.i2c.bus.write_i2c_block_data(
+                          self.i2c.address, self.MCP23017_GPIOB,
+                          [lo, hi, lo])
+                    self.transactions += 3
+                    if (bits & 0b00000010) == 0: break # D7=0, not busy
+            except IOError:
+                self.resync()
+                raise
             self.portb = lo
 
             # Polling complete, change D7 pin to output
             self.ddrb &= 0b11101111
-            self.i2c.bus.write_byte_data(self.i2c.address,
-              self.MCP23017_IODIRB, self.ddrb)
+            self.writeReg(self.MCP23017_IODIRB, self.ddrb)
 
         bitmask = self.portb & 0b00000001   # Mask out PORTB LCD control bits
         if char_mode: bitmask |= 0b10000000 # Set data bit if not a command
 
-        # If string or list, iterate through multiple write ops
-        if isinstance(value, str):
-            last = len(value) - 1 # Last character in string
-            data = []             # Start with blank list
-            for i, v in enumerate(value): # For each character...
-                # Append 4 bytes to list representing PORTB over time.
-                # First the high 4 data bits with strobe (enable) set
-                # and unset, then same with low 4 data bits (strobe 1/0).
-                data.extend(self.out4(bitmask, ord(v)))
-                # I2C block data write is limited to 32 bytes max.
-                # If limit reached, write data so far and clear.
-                # Also do this on last byte if not otherwise handled.
-                if (len(data) >= 32) or (i == last):
-                    self.i2c.bus.write_i2c_block_data(
-                      self.i2c.address, self.MCP23017_GPIOB, data)
-                    self.portb = data[-1] # Save state of last byte out
-                    data       = []       # Clear list for next iteration
-        elif isinstance(value, list):
-            # Same as above, but for list instead of string
-            last = len(value) - 1
-            data = []
-            for i, v in enumerate(value):
-                data.extend(self.out4(bitmask, v))
-                if (len(data) >= 32) or (i == last):
-                    self.i2c.bus.write_i2c_block_data(
-                      self.i2c.address, self.MCP23017_GPIOB, data)
-                    self.portb = data[-1]
-                    data       = []
-        else:
+        if isinstance(value, int):
             # Single byte
-            data = self.out4(bitmask, value)
-            self.i2c.bus.write_i2c_block_data(
-              self.i2c.address, self.MCP23017_GPIOB, data)
-            self.portb = data[-1]
+            chunks = (list(self.encoded[bitmask][value]),)
+        else:
+            # String, bytes or list: pre-split 32-byte chunks
+            chunks = self.chunks(value, bitmask)
+
+        if self.batch:
+            # Inside a frame: queue the stream, flush() sends it later
+            for data in chunks: self.pending.extend(data)
+            if chunks: self.portb = chunks[-1][-1]
+        else:
+            if self.timed: self.settle()
+            for data in chunks: self.writeBlock(data)
+            if chunks: self.portb = chunks[-1][-1] # State of last byte out
 
         # If a poll-worthy instruction was issued, reconfigure D7
         # pin as input to indicate need for polling on next call.
+        # Anything queued behind it would be sent too soon, so a
+        # frame in progress is flushed first.
         if (not char_mode) and (value in self.pollables):
-            self.ddrb |= 0b00010000
-            self.i2c.bus.write_byte_data(self.i2c.address,
-              self.MCP23017_IODIRB, self.ddrb)
+            self.flush()
+            if self.timed:
+                self.ready = self.monotonic() + self.LCD_SLOWDELAY
+            else:
+                self.ddrb |= 0b00010000
+                self.writeReg(self.MCP23017_IODIRB, self.ddrb)
+
+        self.track(value, char_mode)
+
+
+    # Frames batch everything written between beginFrame() and the
+    # matching endFrame() -- cursor moves, line breaks and data alike --
+    # into one PORTB stream, sent as few 32-byte block writes as
+    # possible.  Each 4-byte group in the stream carries its own RS bit
+    # and ends with the strobe low, so commands and data can share a
+    # block, and 32 being a multiple of 4, groups don't straddle blocks
+    # (unless a lone backlight byte is queued in between, which is
+    # harmless).  Frames nest; only the outermost endFrame() flushes.
+    # frameTransactions and frameBytes describe the last whole frame.
+    def beginFrame(self):
+        if self.batch == 0:
+            self.frameStart = self.transactions
+            self.frameBytes = 0
+        self.batch += 1
+
+
+    def endFrame(self):
+        self.batch -= 1
+        if self.batch == 0:
+            self.flush()
+            self.frameTransactions = self.transactions - self.frameStart
+            self.saveState()
+
+
+    # Send whatever a frame has queued so far.
+    def flush(self):
+        data = self.pending
+        if data and self.timed: self.settle()
+        for i in range(0, len(data), 32):
+            self.writeBlock(list(data[i:i + 32]))
+        del data[:]
+
+
+    # ----------------------------------------------------------------------
+    # Register access
+
+    # Output register writes go through a write-through copy of what the
+    # chip holds, and writes that wouldn't change anything are skipped
+    # (regHits counts those, regMisses the writes that went out).  The
+    # GPIO registers are filed under their output latches, since that is
+    # what writing GPIO changes.  After a bus error nothing in the copy
+    # can be trusted, so it is reloaded from the chip (see resync()).
+    latches = { MCP23017_GPIOA : MCP23017_OLATA,
+                MCP23017_GPIOB : MCP23017_OLATB }
+
+    # Input register reads.  Unlike Adafruit_I2C.readU8(), a bus error
+    # raises IOError instead of coming back as -1, which would read as
+    # every button down.  These are made by the thread reading the
+    # buttons, so they are counted in 'reads', not 'transactions'.
+    def readReg(self, reg):
+        value = self.reader.read_byte_data(self.i2c.address, reg)
+        self.reads += 1
+        return value
+
+    def writeReg(self, reg, value):
+        key = self.latches.get(reg, reg)
+        if self.regs.get(key) == value:
+            self.regHits += 1
+            return
+        self.regMisses += 1
+        try:
+            self.i2c.bus.write_byte_data(self.i2c.address, reg, value)
+        except IOError:
+            self.resync()
+            raise
+        self.regs[key]     = value
+        self.transactions += 1
+
+
+    # Write a PORTB stream to GPIOB in one block write.
+    def writeBlock(self, data):
+        try:
+            self.i2c.bus.write_i2c_block_data(
+              self.i2c.address, self.MCP23017_GPIOB, data)
+        except IOError:
+            self.resync()
+            raise
+        self.regs[self.MCP23017_OLATB] = data[-1]
+        self.transactions += 1
+        self.frameBytes   += len(data)
+
+
+    # True if the expander is in bank 1 with sequential operation off and
+    # port A set up for the buttons, as the constructor leaves it.  From
+    # power-on (or after stop()) it's in bank 0, where these addresses
+    # hold other registers and don't read back like this.
+    def configured(self):
+        expect = ((self.MCP23017_IOCON_BANK1, 0b10100000),
+                  (self.MCP23017_IODIRA,      0b00111111),
+                  (self.MCP23017_IPOLA,       0b00111111),
+                  (self.MCP23017_GPPUA,       0b00111111))
+        try:
+            for reg, value in expect:
+                self.transactions += 1
+                if self.i2c.bus.read_byte_data(
+                     self.i2c.address, reg) != value:
+                    return False
+        except IOError:
+            return False
+        return True
+
+
+    # Reload the register copy from the chip.  If that fails too, forget
+    # it instead, so every register is rewritten next time.
+    def resync(self):
+        self.regs = {}
+        try:
+            for reg in (self.MCP23017_IODIRB,
+                        self.MCP23017_OLATA, self.MCP23017_OLATB):
+                self.regs[reg] = self.i2c.bus.read_byte_data(
+                  self.i2c.address, reg)
+                self.transactions += 1
+        except IOError:
+            self.regs = {}
+
+
+    # Mirror the effect of a write on the DDRAM shadow and address
+    # counter.  Assumes left-to-right entry mode, which is all this
+    # library's callers use.
+    def track(self, value, char_mode):
+        if char_mode:
+            if self.cgmode: return # CGRAM data, DDRAM unaffected
+            if isinstance(value, str):
+                value = value.encode('latin-1', 'replace')
+            elif isinstance(value, int):
+                value = (value,)
+            for v in value:
+                self.shadow[self.hwaddr] = v & 0xFF
+                self.hwaddr = (self.hwaddr + 1) % self.DDRAM_SIZE
+        elif isinstance(value, int):
+            if value & self.LCD_SETDDRAMADDR:
+                self.hwaddr = self.ddramIndex(value & 0x7F)
+                self.cgmode = False
+            elif value & self.LCD_SETCGRAMADDR:
+                self.cgmode = True
+            elif value & 0xF0 == self.LCD_CURSORSHIFT:
+                step = 1 if value & self.LCD_MOVERIGHT else -1
+                if value & self.LCD_DISPLAYMOVE:
+                    # Display moves right = window onto DDRAM moves left
+                    self.shift = (self.shift - step) % self.DDRAM_COLS
+                else:
+                    self.hwaddr = (self.hwaddr + step) % self.DDRAM_SIZE
+            elif value == self.LCD_CLEARDISPLAY:
+                self.shadow[:] = b' ' * self.DDRAM_SIZE
+                self.hwaddr = 0
+                self.shift  = 0
+                self.cgmode = False
+            elif value == self.LCD_RETURNHOME:
+                self.hwaddr = 0
+                self.shift  = 0
+                self.cgmode = False
+
+
+    # Save the DDRAM shadow and CGRAM contents to the state file, if they
+    # changed since last time.  The file is replaced in one go, so a
+    # restart never reads a half-written one.  If it can't be written,
+    # saving is given up for the rest of the run.
+    def saveState(self):
+        if not self.state: return
+        saved = (bytes(self.shadow), tuple(self.cgram))
+        if saved == self.saved: return
+        temp = self.state + '.tmp'
+        try:
+            with open(temp, 'w') as f:
+                json.dump({ 'ddram' : saved[0].hex(),
+                            'cgram' : [b and list(b) for b in saved[1]] }, f)
+            os.replace(temp, self.state)
+        except OSError as err:
+            print('LCD state %s: %s' % (self.state, err))
+            self.state = None
+            return
+        self.saved = saved
+
+
+    # Read the state file back.  Restores the CGRAM bookkeeping (the
+    # glyphs are still in the LCD) and returns the DDRAM contents, or
+    # None if there's no usable state file.
+    def loadState(self):
+        if not self.state: return None
+        try:
+            with open(self.state) as f:
+                state = json.load(f)
+            ddram = bytes.fromhex(state['ddram'])
+            cgram = [b and tuple(b) for b in state['cgram']]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if len(ddram) != self.DDRAM_SIZE or len(cgram) != 8:
+            return None
+        self.cgram = cgram
+        self.saved = (ddram, tuple(cgram))
+        return ddram
+
+
+    # Write ddram (DDRAM_SIZE bytes, as in the shadow) to the display.
+    def repaint(self, ddram):
+        self.beginFrame()
+        self.write(self.LCD_SETDDRAMADDR)
+        self.write(ddram[:self.DDRAM_COLS], True)
+        self.write(self.LCD_SETDDRAMADDR | 0x40)
+        self.write(ddram[self.DDRAM_COLS:], True)
+        self.write(self.LCD_SETDDRAMADDR)
+        self.endFrame()
+        self.addr = self.hwaddr
+
+
+    # Convert between DDRAM addresses and linear shadow indices.
+    def ddramIndex(self, addr):
+        if addr >= 0x40: return (self.DDRAM_COLS + addr - 0x40) % self.DDRAM_SIZE
+        return addr % self.DDRAM_COLS
+
+
+    def ddramAddr(self, index):
+        if index >= self.DDRAM_COLS: return 0x40 + index - self.DDRAM_COLS
+        return index
 
 
     # ----------------------------------------------------------------------
@@ -260,7 +667,9 @@ class Adafruit_CharLCDPlate(Adafruit_I2C):
     def begin(self, cols, lines):
         self.currline = 0
         self.numlines = lines
-        self.clear()
+        self.numcols  = cols
+        # After a warm start the display already shows the last frame
+        if not self.warm: self.clear()
 
 
     # Puts the MCP23017 back in Bank 0 + sequential write mode so
@@ -270,50 +679,77 @@ class Adafruit_CharLCDPlate(Adafruit_I2C):
     def stop(self):
         self.porta = 0b11000000  # Turn off LEDs on the way out
         self.portb = 0b00000001
-        sleep(0.0015)
-        self.i2c.bus.write_byte_data(
-          self.i2c.address, self.MCP23017_IOCON_BANK1, 0)
-        self.i2c.bus.write_i2c_block_data(
-          self.i2c.address, 0, 
-          [ 0b00111111,   # IODIRA
-            self.ddrb ,   # IODIRB
-            0b00000000,   # IPOLA
-            0b00000000,   # IPOLB
-            0b00000000,   # GPINTENA
-            0b00000000,   # GPINTENB
-            0b00000000,   # DEFVALA
-            0b00000000,   # DEFVALB
-            0b00000000,   # INTCONA
-            0b00000000,   # INTCONB
-            0b00000000,   # IOCON
-            0b00000000,   # IOCON
-            0b00111111,   # GPPUA
-            0b00000000,   # GPPUB
-            0b00000000,   # INTFA
-            0b00000000,   # INTFB
-            0b00000000,   # INTCAPA
-            0b00000000,   # INTCAPB
-            self.porta,   # GPIOA
-            self.portb,   # GPIOB
-            self.porta,   # OLATA
-            self.portb ]) # OLATB
+        self.sleep(0.0015)
+        with self.i2c.hold():
+            self.i2c.bus.write_byte_data(
+              self.i2c.address, self.MCP23017_IOCON_BANK1, 0)
+            self.i2c.bus.write_i2c_block_data(
+              self.i2c.address, 0, 
+              [ 0b00111111,   # IODIRA
+                self.ddrb ,   # IODIRB
+                0b00000000,   # IPOLA
+                0b00000000,   # IPOLB
+                0b00000000,   # GPINTENA
+                0b00000000,   # GPINTENB
+                0b00000000,   # DEFVALA
+                0b00000000,   # DEFVALB
+                0b00000000,   # INTCONA
+                0b00000000,   # INTCONB
+                0b00000000,   # IOCON
+                0b00000000,   # IOCON
+                0b00111111,   # GPPUA
+                0b00000000,   # GPPUB
+                0b00000000,   # INTFA
+                0b00000000,   # INTFB
+                0b00000000,   # INTCAPA
+                0b00000000,   # INTCAPB
+                self.porta,   # GPIOA
+                self.portb,   # GPIOB
+                self.porta,   # OLATA
+                self.portb ]) # OLATB
+        self.regs = {}    # Bank 0 now; register copy no longer applies
 
 
     def clear(self):
         self.write(self.LCD_CLEARDISPLAY)
+        self.addr = 0
 
 
     def home(self):
         self.write(self.LCD_RETURNHOME)
+        self.addr = 0
 
 
     row_offsets = ( 0x00, 0x40, 0x14, 0x54 )
     def setCursor(self, col, row):
         if row > self.numlines: row = self.numlines - 1
         elif row < 0:           row = 0
+        self.addr = self.ddramIndex(col + self.row_offsets[row])
+        # In framebuffer mode the move is deferred to the next message(),
+        # which may not need it at all, unless the cursor is visible.
+        self.fbMoved = self.fb and not self.cursorVisible()
+        if self.fbMoved: return
         self.write(self.LCD_SETDDRAMADDR | (col + self.row_offsets[row]))
 
 
+    def cursorVisible(self):
+        return bool(self.displaycontrol &
+                    (self.LCD_CURSORON | self.LCD_BLINKON))
+
+
+    def framebuffer(self):
+        """ message() sends only the cells that differ from DDRAM """
+        self.fb = True
+
+
+    def noFramebuffer(self):
+        """ message() rewrites every character it is given """
+        self.fb      = False
+        self.fbMoved = False
+        if self.hwaddr != self.addr:
+            self.write(self.LCD_SETDDRAMADDR | self.ddramAddr(self.addr))
+
+
     def display(self):
         """ Turn the display on (quickly) """
         self.displaycontrol |= self.LCD_DISPLAYON
@@ -326,6 +762,13 @@ class Adafruit_CharLCDPlate(Adafruit_I2C):
         self.write(self.LCD_DISPLAYCONTROL | self.displaycontrol)
 
 
+    def invisible(self):
+        """ True if nothing written would be seen: the display or the
+            backlight is off """
+        return (self.color == self.OFF or
+                not self.displaycontrol & self.LCD_DISPLAYON)
+
+
     def cursor(self):
         """ Underline cursor on """
         self.displaycontrol |= self.LCD_CURSORON
@@ -399,39 +842,220 @@ class Adafruit_CharLCDPlate(Adafruit_I2C):
 
 
     def createChar(self, location, bitmap):
-        self.write(self.LCD_SETCGRAMADDR | ((location & 7) << 3))
-        self.write(bitmap, True)
+        location = location & 7
+        bitmap   = tuple(bitmap)
+        self.cgramTick += 1
+        self.cgramUsed[location] = self.cgramTick
+        # Each upload is three writes plus a DDRAM address reset; skip
+        # it when the slot already holds this exact bitmap.
+        if self.cgram[location] == bitmap:
+            self.cgramSkips += 1
+            return
+        self.write(self.LCD_SETCGRAMADDR | (location << 3))
+        self.write(list(bitmap), True)
         self.write(self.LCD_SETDDRAMADDR)
+        self.cgram[location] = bitmap
+        self.cgramUploads   += 1
+
+
+    # ----------------------------------------------------------------------
+    # Custom glyphs
+
+    # Rather than managing the 8 CGRAM slots by hand, callers can register
+    # a bitmap with glyph() and get back a one-character string (from the
+    # Unicode private use area) to put in text passed to message().  The
+    # glyph is uploaded to a slot the first time it is shown and stays
+    # there until the slot is needed for something else, so screens can
+    # use any number of glyphs over time, up to 8 at once.  Slots are
+    # reused least-recently-used first, avoiding ones still on screen if
+    # possible.  Mixing glyph() with hand-placed createChar() slots is not
+    # supported: the allocator may reclaim those slots.
+    GLYPH_BASE = 0xF000
+    glyphs     = {}    # Placeholder character -> bitmap tuple
+
+    @classmethod
+    def glyph(cls, bitmap):
+        """ Return the placeholder character for a custom bitmap """
+        bitmap = tuple(bitmap)
+        for c, b in cls.glyphs.items():
+            if b == bitmap: return c
+        c = chr(cls.GLYPH_BASE + len(cls.glyphs))
+        cls.glyphs[c] = bitmap
+        return c
+
+
+    # Load every glyph used in text into a CGRAM slot and replace the
+    # placeholders with slot numbers.
+    def mapGlyphs(self, text):
+        needed = [c for c in set(text) if c in self.glyphs]
+        if not needed: return text
+        table  = {}
+        wanted = set(self.glyphs[c] for c in needed)
+        hwaddr = self.hwaddr
+        for c in needed:
+            bitmap = self.glyphs[c]
+            if bitmap in self.cgram:
+                slot = self.cgram.index(bitmap)
+            else:
+                slot = self.cgramSlot(wanted)
+                if slot is None:        # More than 8 glyphs in one text
+                    table[ord(c)] = '?'
+                    continue
+            self.createChar(slot, bitmap)
+            table[ord(c)] = chr(slot)
+        # An upload leaves the address counter at 0; put it back where
+        # the caller left it (framebuffer mode moves it as needed anyway)
+        if not self.fb and self.hwaddr != hwaddr:
+            self.write(self.LCD_SETDDRAMADDR | self.ddramAddr(hwaddr))
+        return text.translate(table)
+
+
+    # Pick a slot to (re)load: an empty one if there is one, else the
+    # least recently used of those not wanted by the current text,
+    # preferring slots not visible on screen.
+    def cgramSlot(self, wanted):
+        free = [i for i in range(8)
+                if self.cgram[i] is None or self.cgram[i] not in wanted]
+        if not free: return None
+        for i in free:
+            if self.cgram[i] is None: return i
+        visible = self.visible()
+        hidden  = [i for i in free if i not in visible]
+        return min(hidden or free, key=lambda i: self.cgramUsed[i])
+
+
+    # Set of character codes currently in view, allowing for display shift
+    def visible(self):
+        cells = set()
+        for row in (0, self.DDRAM_COLS):
+            for col in range(self.numcols):
+                cells.add(self.shadow[row + (self.shift + col) % self.DDRAM_COLS])
+        return cells
 
 
     def message(self, text):
         """ Send string to LCD. Newline wraps to second line"""
-        lines = str(text).split('\n')    # Split at newline(s)
-        for i, line in enumerate(lines): # For each substring...
-            if i > 0:                    # If newline(s),
-                self.write(0xC0)         #  set DDRAM address to 2nd line
-            self.write(line, True)       # Issue substring
+        self.beginFrame()
+        text  = self.mapGlyphs(str(text))
+        lines = text.split('\n')         # Split at newline(s)
+        if self.fb:
+            self.fbMessage(lines)
+        else:
+            for i, line in enumerate(lines): # For each substring...
+                if i > 0:                    # If newline(s),
+                    self.write(0xC0)         #  set DDRAM address to 2nd line
+                self.write(line, True)       # Issue substring
+            self.addr = self.hwaddr
+        self.endFrame()
+
+
+    # Framebuffer mode version of message().  Lays the text out over the
+    # DDRAM shadow exactly as the plain version would, then sends only
+    # the runs of cells that differ, each preceded by a cursor move if
+    # the controller's address counter isn't already there.  A cursor
+    # move costs as much as one character, so runs separated by a single
+    # unchanged cell are merged rather than split.
+    def fbMessage(self, lines):
+        size  = self.DDRAM_SIZE
+        cells = {}
+        index = self.addr
+        for i, line in enumerate(lines):
+            if i > 0: index = self.DDRAM_COLS # 0xC0, start of 2nd line
+            for v in line.encode('latin-1', 'replace'):
+                cells[index] = v
+                index = (index + 1) % size
+        # What the plain version would send: the text and line breaks,
+        # and the setCursor() it wouldn't have held back, as sent may
+        # include it
+        full = 4 * (sum(len(line) for line in lines) + len(lines) - 1 +
+                    self.fbMoved)
+        self.fbMoved = False
+
+        runs  = []  # [start, bytearray] pairs in DDRAM order
+        for i in sorted(cells):
+            if cells[i] == self.shadow[i]: continue
+            if runs:
+                start, data = runs[-1]
+                end = start + len(data)
+                if i == end:
+                    data.append(cells[i])
+                    continue
+                if i == end + 1:
+                    data.append(cells.get(end, self.shadow[end]))
+                    data.append(cells[i])
+                    continue
+            runs.append([i, bytearray((cells[i],))])
+
+        sent = 0
+        for start, data in runs:
+            if start != self.hwaddr:
+                self.write(self.LCD_SETDDRAMADDR | self.ddramAddr(start))
+                sent += 4
+            self.write(bytes(data), True)
+            sent += 4 * len(data)
+
+        self.addr = index
+        if self.cursorVisible() and self.hwaddr != self.addr:
+            self.write(self.LCD_SETDDRAMADDR | self.ddramAddr(self.addr))
+            sent += 4
+        self.fbSent  += sent
+        self.fbSaved += full - sent
 
 
     def backlight(self, color):
+        self.color = color
         c          = ~color
         self.porta = (self.porta & 0b00111111) | ((c & 0b011) << 6)
         self.portb = (self.portb & 0b11111110) | ((c & 0b100) >> 2)
-        # Has to be done as two writes because sequential operation is off.
-        self.i2c.bus.write_byte_data(
-          self.i2c.address, self.MCP23017_GPIOA, self.porta)
-        self.i2c.bus.write_byte_data(
-          self.i2c.address, self.MCP23017_GPIOB, self.portb)
+        # Has to be done as two writes because sequential operation is off,
+        # but either is skipped if its LEDs don't change.  Inside a frame
+        # the blue LED (PORTB) rides along with the LCD data instead: the
+        # queued bytes still carry the old LED bit and anything queued
+        # after this carries the new one.
+        self.writeReg(self.MCP23017_GPIOA, self.porta)
+        if self.batch:
+            self.pending.append(self.portb)
+        else:
+            self.writeReg(self.MCP23017_GPIOB, self.portb)
 
 
     # Read state of single button
     def buttonPressed(self, b):
-        return (self.i2c.readU8(self.MCP23017_GPIOA) >> b) & 1
+        return (self.readReg(self.MCP23017_GPIOA) >> b) & 1
 
 
     # Read and return bitmask of combined button state
     def buttons(self):
-        return self.i2c.readU8(self.MCP23017_GPIOA) & 0b11111
+        return self.readReg(self.MCP23017_GPIOA) & 0b11111
+
+
+    # Turn button latching (see buttonStates()) on or off.
+    def latchButtons(self, latch=True):
+        self.latch = latch
+        self.writeReg(self.MCP23017_GPINTENA, 0b00011111 if latch else 0)
+
+
+    # In latch mode, return the button states since the last call, as a
+    # list of bitmasks, oldest first.  Empty if no button has changed.
+    # Otherwise the first entry is the state captured by the expander
+    # when the first button changed, and the last the current state, so
+    # a press and release that both fall between two calls still shows
+    # up as a press followed by a release.  (Further changes in between
+    # aren't captured: INTCAPA holds until it or GPIOA is read.)
+    #
+    # The idle case is a single read of INTFA.  INTFA, INTCAPA and GPIOA
+    # are adjacent, but with sequential operation disabled the address
+    # pointer doesn't advance, so they can't come back as one block read;
+    # turning SEQOP on would break the GPIOB block writes to the LCD.
+    # Reading GPIOA elsewhere (buttons(), buttonPressed()) also clears a
+    # pending capture, though the state it returns is then current.
+    def buttonStates(self):
+        if not self.readReg(self.MCP23017_INTFA) & 0b11111:
+            return []
+        captured = self.readReg(self.MCP23017_INTCAPA) & 0b11111
+        current  = self.readReg(self.MCP23017_GPIOA)   & 0b11111
+        if captured == current: return [current]
+        return [captured, current]
 
     # ----------------------------------------------------------------------
     # Test code
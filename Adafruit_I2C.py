@@ -1,6 +1,114 @@
 #!/usr/bin/python
 
-import smbus
+import os
+import threading
+from time import monotonic
+
+# ===========================================================================
+# Bus arbiter
+# ===========================================================================
+
+class Arbiter :
+  """Serialises transactions on one bus between threads.  Each client
+  (see client()) has a priority; when the bus comes free, the waiting
+  client with the highest priority goes next.  Transactions are the unit
+  of scheduling, so a long write split into block writes lets a
+  higher-priority read in between blocks.  hold() keeps the bus for a
+  sequence of transactions that must not be split up."""
+
+  NORMAL = 0
+  HIGH   = 1
+
+  def __init__(self, bus):
+    self.bus     = bus
+    self.cond    = threading.Condition()
+    self.owner   = None  # Thread using the bus
+    self.depth   = 0     # Nested acquire()s by that thread
+    self.waiting = [0, 0] # Threads waiting, per priority
+    self.clients = {}
+
+  def client(self, name, priority=NORMAL):
+    "Returns the named client of this bus, making it if needed"
+    if name not in self.clients:
+      self.clients[name] = ArbiterClient(self, name, priority)
+    return self.clients[name]
+
+  def acquire(self, priority):
+    "Waits for the bus; returns the seconds spent waiting"
+    me = threading.current_thread()
+    with self.cond:
+      if self.owner is me:
+        self.depth += 1
+        return 0.0
+      start = monotonic()
+      self.waiting[priority] += 1
+      while (self.owner is not None or
+             any(self.waiting[priority + 1:])):
+        self.cond.wait()
+      self.waiting[priority] -= 1
+      self.owner, self.depth = me, 1
+      return monotonic() - start
+
+  def release(self):
+    with self.cond:
+      self.depth -= 1
+      if not self.depth:
+        self.owner = None
+        self.cond.notify_all()
+
+  def stats(self):
+    "Returns {client: (transactions, mean wait, max wait)}, waits in s"
+    return dict((name, (c.count, c.waited / max(c.count, 1), c.maxWait))
+                for name, c in self.clients.items())
+
+
+class ArbiterClient :
+  """smbus.SMBus-like handle whose transactions go through an Arbiter
+  at one priority, recording how long each waited for the bus."""
+
+  def __init__(self, arbiter, name, priority):
+    self.arbiter  = arbiter
+    self.name     = name
+    self.priority = priority
+    self.count    = 0    # Transactions
+    self.waited   = 0.0  # Total seconds waiting for the bus
+    self.maxWait  = 0.0  # Longest wait
+
+  def hold(self):
+    "Context manager keeping the bus for a sequence of transactions"
+    return ArbiterHold(self)
+
+  def acquire(self):
+    wait = self.arbiter.acquire(self.priority)
+    self.waited += wait
+    if wait > self.maxWait: self.maxWait = wait
+
+  def __getattr__(self, name):
+    # Bus methods are wrapped, anything else (an emulator's state, say)
+    # is passed through
+    attr = getattr(self.arbiter.bus, name)
+    if not callable(attr): return attr
+    def transaction(*args):
+      self.acquire()
+      try:
+        self.count += 1
+        return attr(*args)
+      finally:
+        self.arbiter.release()
+    return transaction
+
+
+class ArbiterHold :
+
+  def __init__(self, client):
+    self.client = client
+
+  def __enter__(self):
+    self.client.acquire()
+    return self.client
+
+  def __exit__(self, *exc):
+    self.client.arbiter.release()
 
 # ===========================================================================
 # Adafruit_I2C Class
@@ -19,23 +127,63 @@ class Adafruit_I2C :
           if line.startswith('Revision'):
             return 1 if line.rstrip()[-1] in ['1','2'] else 2
     except:
-      return 0
+      pass
+    return 0    # Not a Pi (or no Revision line): unknown
 
   @staticmethod
   def getPiI2CBusNumber():
     # Gets the I2C bus number /dev/i2c#
     return 1 if Adafruit_I2C.getPiRevision() > 1 else 0
  
-  def __init__(self, address, busnum=-1, debug=False):
+  @staticmethod
+  def emulator(speed, busnum, address):
+    "Returns an emulated bus (see SMBusEmulator.py) running at speed"
+    from SMBusEmulator import SMBusEmulator
+    speed = str(speed).lower()
+    hz    = 100000
+    if speed.endswith('k') and speed[:-1].isdigit():
+      hz = int(speed[:-1]) * 1000
+    elif speed.isdigit() and int(speed) > 1:
+      hz = int(speed)
+    return SMBusEmulator(busnum, hz, address)
+
+  def __init__(self, address, busnum=-1, debug=False, bus=None,
+               client='i2c', arbiter=None):
     self.address = address
     # By default, the correct I2C bus is auto-detected using /proc/cpuinfo
     # Alternatively, you can hard-code the bus version below:
     # self.bus = smbus.SMBus(0); # Force I2C0 (early 256MB Pi's)
     # self.bus = smbus.SMBus(1); # Force I2C1 (512MB Pi's)
-    self.bus = smbus.SMBus(
-      busnum if busnum >= 0 else Adafruit_I2C.getPiI2CBusNumber())
+    # bus may be an smbus.SMBus-like object to use instead, or
+    # 'emulator' (optionally 'emulator:400k') for an emulated LCD plate.
+    # Setting I2C_EMULATOR in the environment (to 1, 100k, 400k...) does
+    # the same for code that doesn't pass bus.  Either way there is no
+    # /dev/i2c to find, so the bus number is only auto-detected for smbus.
+    if bus is None and os.environ.get('I2C_EMULATOR'):
+      bus = 'emulator:' + os.environ['I2C_EMULATOR']
+    if isinstance(bus, str) and bus.startswith('emulator'):
+      bus = Adafruit_I2C.emulator(bus[9:] or 100000,
+                                  busnum if busnum >= 0 else 1, address)
+    if bus is None:
+      import smbus
+      if busnum < 0:
+        busnum = Adafruit_I2C.getPiI2CBusNumber()
+      bus = smbus.SMBus(busnum)
+    # All transactions go through an arbiter, so threads sharing the bus
+    # (display writes, button reads) take turns; see client().  Pass an
+    # existing arbiter to share one between devices on the same bus.
+    self.arbiter = arbiter or Arbiter(bus)
+    self.bus = self.arbiter.client(client)
     self.debug = debug
 
+  def client(self, name, priority=Arbiter.NORMAL):
+    "Returns another handle on the bus, for a thread with its own priority"
+    return self.arbiter.client(name, priority)
+
+  def hold(self):
+    "Keeps the bus for the with block: 'with i2c.hold(): ...'"
+    return self.bus.hold()
+
   def reverseByteOrder(self, data):
     "Reverses the byte order of an int (16-bit) or long (32-bit) value"
     # Courtesy Vishal Sapre
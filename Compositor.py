@@ -0,0 +1,190 @@
+# Compositor.py
+#
+# Owns the LCD plate on a single worker thread, so the I2C bus is only
+# ever driven from one place.  Producers hand over whole screens with
+# show(); only the latest one is kept, and frames are pushed at most
+# 'fps' times a second, so a fast producer can never build a backlog.
+# Anything else that touches the display (backlight, cursor, blink...)
+# is passed in with call() and runs on the worker thread in order.
+# Frames with a line too wide for the display are scrolled as a Marquee,
+# one step every 'scroll' seconds, until a different frame is shown.
+# Text is converted to the LCD's character set (see charset.py) here,
+# before it is measured, so plain Unicode can be shown.
+#
+# Nothing is written while it couldn't be seen (backlight or display
+# off): the latest frame is held back and pushed when the display is
+# visible again.  With 'idle' set, the compositor also turns the
+# backlight off itself after that many seconds without a touch() (call
+# it on every input event); the next touch() turns it back on and
+# repaints the display once.
+import traceback
+from collections import deque
+from threading   import Condition, Thread
+from time        import monotonic
+from Marquee     import Marquee
+from charset     import lcdText
+
+
+class Compositor:
+    HOLD = 1.5  # Seconds a marquee stays still before it starts to move
+
+    def __init__(self, lcd, fps=10, cols=16, rows=2, scroll=0.35,
+                 idle=None):
+        self.lcd      = lcd
+        self.interval = 1.0 / fps
+        self.cols     = cols
+        self.rows     = rows
+        self.cond     = Condition()
+        self.frame    = None    # Latest frame not yet pushed
+        self.ops      = deque() # (function, args) to run, in order
+        self.busy     = False   # Worker is running ops or pushing a frame
+        self.last     = 0.0     # When the last frame was pushed
+        self.frames   = 0       # Frames pushed
+        self.dropped  = 0       # Frames replaced before they were pushed
+        self.marquee  = Marquee(lcd, cols, rows)
+        self.scroll   = scroll
+        self.nextStep = 0.0     # When the marquee moves next
+        self.text     = None    # Last frame pushed
+        self.idle     = idle    # Seconds without input before dozing
+        self.touched  = monotonic() # Last input
+        self.asleep   = False   # Dozing: backlight turned off for idling
+        self.color    = None    # Backlight colour to restore on waking
+        self.sleeps   = 0       # Times dozed off
+        self.thread   = None
+
+    def start(self):
+        self.thread = Thread(target=self.run, name='compositor')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def show(self, text):
+        """ Make text the next frame, replacing any not yet pushed """
+        with self.cond:
+            if self.frame is not None:
+                self.dropped += 1
+            self.frame = text
+            self.cond.notify_all()
+
+    def call(self, function, *args):
+        """ Run function(*args) on the display thread """
+        with self.cond:
+            # A frame shown before this call must reach the display
+            # before it, e.g. a setCursor() that positions a blinking
+            # cursor within that frame's text.
+            if self.frame is not None:
+                self.ops.append((self.push, (self.frame,)))
+                self.frame = None
+            self.ops.append((function, args))
+            self.cond.notify_all()
+
+    def touch(self):
+        """ Note input activity.  Returns True if this woke the display
+            up, so the caller can drop the input that did it. """
+        with self.cond:
+            self.touched = monotonic()
+            if not self.asleep:
+                return False
+            self.asleep = False
+            self.ops.append((self.wake, ()))
+            self.cond.notify_all()
+            return True
+
+    def sync(self, timeout=None):
+        """ Wait until everything shown or called so far is on the display """
+        with self.cond:
+            return self.cond.wait_for(
+                lambda: self.frame is None and not self.ops and not self.busy,
+                timeout)
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.ops:
+                    now     = monotonic()
+                    visible = not self.asleep and not self.lcd.invisible()
+                    due     = []
+                    if self.frame is not None and visible:
+                        due.append(self.last + self.interval)
+                    if self.marquee.active and visible:
+                        due.append(self.nextStep)
+                    if self.idle and not self.asleep:
+                        due.append(self.touched + self.idle)
+                    wait = min(due) - now if due else None
+                    if wait is not None and wait <= 0:
+                        break
+                    self.cond.wait(wait)
+                ops = list(self.ops)
+                self.ops.clear()
+                now     = monotonic()
+                visible = not self.asleep and not self.lcd.invisible()
+                frame   = None
+                if (self.frame is not None and visible and
+                        now >= self.last + self.interval):
+                    frame, self.frame = self.frame, None
+                step = (visible and self.marquee.active and
+                        now >= self.nextStep)
+                doze = (self.idle and not self.asleep and not ops and
+                        now >= self.touched + self.idle)
+                if doze:
+                    self.asleep  = True
+                    self.sleeps += 1
+                self.busy = True
+            try:
+                for function, args in ops:
+                    function(*args)
+                if doze:
+                    self.doze()
+                if frame is not None:
+                    self.push(frame)
+                elif step and self.marquee.active:
+                    self.marquee.step()
+                    self.nextStep = monotonic() + self.scroll
+            except Exception:
+                # A bus error, or an op that failed: reported, and the
+                # display carries on with what comes next
+                traceback.print_exc()
+            finally:
+                with self.cond:
+                    self.busy = False
+                    self.cond.notify_all()
+
+    # Idle for long enough: lights out.
+    def doze(self):
+        self.color = self.lcd.color
+        self.lcd.backlight(self.lcd.OFF)
+
+    # Woken by touch(): lights back on, and the latest frame (or the last
+    # one pushed, if nothing was shown since) is drawn.
+    def wake(self):
+        if self.color is not None:
+            self.lcd.backlight(self.color)
+        with self.cond:
+            if self.frame is None:
+                self.frame = self.text
+            self.last = 0.0
+
+    # Draw a frame.  Every row is padded to the display width, so each
+    # frame fully replaces the last one without a clear; with the plate
+    # in framebuffer mode the padding costs nothing to send.  Frames with
+    # a wider line go to the marquee instead, unless it is already
+    # scrolling that same text.
+    def push(self, text):
+        self.text = text        # As shown: lcdText() isn't idempotent
+        text  = lcdText(str(text))
+        lines = [line.rstrip() for line in text.split('\n')[:self.rows]]
+        lines += [''] * (self.rows - len(lines))
+        self.last    = monotonic()
+        self.frames += 1
+        if max(len(line) for line in lines) > self.cols:
+            text = '\n'.join(lines)
+            if self.marquee.text != text:
+                self.marquee.start(text)
+                self.nextStep = self.last + self.HOLD
+            return
+        if self.marquee.active:
+            self.marquee.stop()
+        text  = '\n'.join(line.ljust(self.cols) for line in lines)
+        self.lcd.beginFrame()
+        self.lcd.setCursor(0, 0)
+        self.lcd.message(text)
+        self.lcd.endFrame()
@@ -0,0 +1,95 @@
+# Debouncer.py
+#
+# Hands values to send() from a worker thread, so the caller never waits
+# on whatever is at the other end.  Callers set() a value as often as
+# they like; only the latest one is kept, and it is sent at most 'rate'
+# times a second.  settle() asks for one more send of the latest value
+# once a run of changes is over, in case one was clamped or lost.
+#
+# With 'quiet' set, a value is only sent once set() has left it alone
+# for that many seconds, so a burst of changes costs one send, of the
+# last one.  radiopi uses that to debounce station changes: zapping
+# through five stations starts only the fifth.  Mixer builds the
+# player's volume control on the same thread.
+import traceback
+from threading import Condition, Thread
+from time      import monotonic
+
+
+class Debouncer:
+
+    def __init__(self, send, rate=5, quiet=0.0, value=None):
+        self.send     = send      # send(value) puts it into effect
+        self.interval = 1.0 / rate
+        self.quiet    = quiet     # Seconds without a set() before sending
+        self.cond     = Condition()
+        self.target   = None      # Latest value not yet sent
+        self.changed  = 0.0       # When it was set
+        self.settling = False     # Send target even if it was the last sent
+        self.sent     = value     # Last value sent (or in effect to start)
+        self.last     = 0.0       # When it was sent
+        self.writes   = 0         # Values sent
+        self.dropped  = 0         # Targets replaced before they were sent
+        self.thread   = None
+
+    def start(self):
+        self.thread = Thread(target=self.run, name=type(self).__name__.lower())
+        self.thread.daemon = True
+        self.thread.start()
+
+    def set(self, value):
+        """ Make value the next one sent, replacing any not yet sent """
+        with self.cond:
+            if self.target is not None:
+                self.dropped += 1
+            self.target  = value
+            self.changed = monotonic()
+            self.cond.notify_all()
+
+    def settle(self):
+        """ Send the latest value once more when the rate allows """
+        with self.cond:
+            if self.target is None:
+                self.target = self.sent
+            self.settling = self.target is not None
+            self.cond.notify_all()
+
+    def reset(self, value):
+        """ Take value as in effect already (it was put there some other
+            way), dropping any not yet sent """
+        with self.cond:
+            self.target   = None
+            self.settling = False
+            self.sent     = value
+            self.cond.notify_all()
+
+    # With the lock held: the value to send now, or None and the seconds
+    # to wait before asking again (None: until something changes).
+    def due(self, now):
+        if self.target is None:
+            return None, None
+        if self.target == self.sent and not self.settling:
+            self.target = None
+            return None, None
+        wait = max(self.last + self.interval,
+                   self.changed + self.quiet) - now
+        if wait > 0:
+            return None, wait
+        value, self.target = self.target, None
+        return value, None
+
+    def run(self):
+        while True:
+            with self.cond:
+                value, wait = self.due(monotonic())
+                while value is None:
+                    self.cond.wait(wait)
+                    value, wait = self.due(monotonic())
+                self.settling = False
+                self.sent     = value
+                self.last     = monotonic()
+                self.writes  += 1
+            try:
+                self.send(value)
+            except (IOError, OSError):
+                traceback.print_exc()
@@ -0,0 +1,137 @@
+# InputService.py
+#
+# Polls the plate's buttons on a worker thread and hands the resulting
+# gesture events (see buttons.py) to whoever is waiting for input, through
+# a queue, so no UI loop has to poll or sleep on its own.
+#
+# The poll rate adapts: every 'fast' seconds while a button is down and
+# for 'linger' seconds after the last event, so presses are picked up
+# quickly while someone is using the buttons, backing off to every
+# 'slow' seconds when idle, and to every 'sleepy' seconds while asleep()
+# says the UI is dozing (e.g. the compositor turned the backlight off).
+# A poll is also made when a gesture timer (a click waiting for a
+# possible double, a hold) is due.  With the plate in latch mode (see
+# Adafruit_CharLCDPlate.buttonStates()) a press shorter than the idle
+# interval is still caught, so 'slow' can be generous.
+#
+# Each poll is a single I2C read, which doesn't disturb the compositor
+# thread's writes to the LCD.  While reads fail, polls back off to at
+# most every 'retry' seconds, and only the first failure is reported.
+import traceback
+from queue     import Queue, Empty
+from threading import Event as Flag, Thread
+from time      import monotonic, thread_time
+from buttons   import Gestures
+
+
+class InputService:
+
+    def __init__(self, lcd, gestures=None, fast=0.01, slow=0.1, linger=2.0,
+                 sleepy=0.5, asleep=None, retry=5.0):
+        self.lcd      = lcd
+        self.gestures = gestures or Gestures()
+        self.fast     = fast
+        self.slow     = slow
+        self.linger   = linger
+        self.sleepy   = sleepy
+        self.asleep   = asleep
+        self.retry    = retry
+        self.queue    = Queue()
+        self.flushing = Flag()  # Set by flush(), taken up by the poller
+        self.flushed  = False   # ...which resets gestures at its next read
+        self.errors   = 0       # Reads failed in a row
+        self.active   = 0.0     # Time of the last event
+        self.polls    = 0       # Button reads so far
+        self.cpu      = 0.0     # CPU seconds used by the polling thread
+        self.started  = None
+        self.thread   = None
+
+    def start(self):
+        self.started = monotonic()
+        self.thread  = Thread(target=self.run, name='input')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def get(self, timeout=None):
+        """ Next event, waiting up to timeout seconds (None: forever);
+            None if there was none by then """
+        try:
+            return self.queue.get(True, timeout)
+        except Empty:
+            return None
+
+    def flush(self):
+        """ Drop events not yet taken, and ignore buttons held down now
+            until they are released """
+        self.flushing.set()
+        while True:
+            try:
+                self.queue.get_nowait()
+            except Empty:
+                break
+
+    def held(self):
+        """ Bitmask of buttons down as of the last poll """
+        return self.gestures.state
+
+    def rate(self):
+        """ Average polls per second since start() """
+        if not self.started: return 0.0
+        return self.polls / max(monotonic() - self.started, 1e-6)
+
+    # Seconds until the next poll is due.
+    def interval(self, now):
+        if self.errors:
+            return min(self.slow * 2 ** self.errors, self.retry)
+        wait = self.slow
+        if self.asleep and self.asleep():
+            wait = self.sleepy
+        if self.gestures.state or now - self.active < self.linger:
+            wait = self.fast
+        due = self.gestures.deadline()
+        if due is not None:
+            wait = min(wait, max(due - now, 0.0))
+        return wait
+
+    def run(self):
+        while True:
+            now = monotonic()
+            try:
+                self.poll(now)
+            except IOError:
+                if not self.errors:
+                    traceback.print_exc()
+                self.errors += 1
+            else:
+                if self.errors:
+                    print('Buttons readable again after %d failed reads'
+                          % self.errors)
+                self.errors = 0
+            self.cpu = thread_time()
+            self.flushing.wait(self.interval(monotonic()))
+
+    def poll(self, now):
+        # Take the flush up before reading, so a read that fails doesn't
+        # leave the flag set and every wait for the next poll cut short
+        if self.flushing.is_set():
+            self.flushing.clear()
+            self.flushed = True
+        if self.lcd.latch:
+            samples = self.lcd.buttonStates()
+        else:
+            samples = [self.lcd.buttons()]
+        self.polls += 1
+        if self.flushed:
+            self.flushed = False
+            self.gestures.reset(samples[-1] if samples
+                                else self.gestures.state)
+            return
+        events = []
+        for sample in samples:
+            events += self.gestures.update(sample, now)
+        if not samples:
+            events = self.gestures.update(None, now)
+        for event in events:
+            self.queue.put(event)
+        if events:
+            self.active = now
@@ -0,0 +1,266 @@
+# InputSources.py
+#
+# Event-driven input from devices other than the plate's own buttons:
+# keyboards and keypads (Linux evdev, /dev/input/event*), rotary encoders
+# (evdev relative axes) and IR remotes (the lircd socket).  Each source
+# translates its input into the plate's button bits (UP, DOWN, ... as in
+# Adafruit_CharLCDPlate) and gesture events (see buttons.py), so the menu
+# and radio controls work the same whichever device they come from.
+#
+# An InputMux waits on all its sources at once with select (epoll on
+# Linux) on a worker thread, and puts their events on a queue, normally
+# the InputService's, to be merged with the plate's.  Nothing is polled:
+# the thread sleeps until a device has input or a gesture timer is due.
+#
+# Every source takes either a path to open or something already open
+# (a file descriptor, file or socket), so tests can substitute a pipe or
+# socketpair() for the device:
+#
+#   r, w = os.pipe()
+#   mux  = InputMux(queue, [EvdevSource(r)])
+#   os.write(w, EvdevSource.pack(EV_KEY, KEY_UP, 1))
+import os
+import selectors
+import socket
+import struct
+import traceback
+from threading import Thread
+from time      import monotonic
+from buttons   import Gestures, Event, PRESS, RELEASE, CLICK
+
+# Plate button bits
+SELECT, RIGHT, DOWN, UP, LEFT = (1 << i for i in range(5))
+
+# From linux/input-event-codes.h
+EV_KEY, EV_REL = 0x01, 0x02
+KEY_ESC, KEY_ENTER, KEY_SPACE, KEY_KPENTER = 1, 28, 57, 96
+KEY_UP, KEY_LEFT, KEY_RIGHT, KEY_DOWN = 103, 105, 106, 108
+KEY_MUTE, KEY_VOLUMEDOWN, KEY_VOLUMEUP = 113, 114, 115
+KEY_KP8, KEY_KP4, KEY_KP6, KEY_KP2, KEY_KP5 = 72, 75, 77, 80, 76
+KEY_SELECT, KEY_OK = 0x161, 0x160
+KEY_CHANNELUP, KEY_CHANNELDOWN = 0x192, 0x193
+REL_X, REL_Y, REL_DIAL, REL_WHEEL = 0x00, 0x01, 0x07, 0x08
+
+
+class Source:
+    """ Base for an input device: something to select() on, turned into
+        button events.  Sources with buttons that can be held down run
+        them through their own Gestures, for clicks and holds. """
+
+    def __init__(self, gestures=None):
+        self.gestures = gestures or Gestures()
+        self.keys     = 0      # Buttons this source has down
+
+    def fileno(self):
+        return self.fd
+
+    # Read whatever is waiting; return the events it gives.
+    def read(self, now):
+        return []
+
+    # Events from gesture timers due by now.
+    def timers(self, now):
+        return self.gestures.update(None, now)
+
+    def deadline(self):
+        return self.gestures.deadline()
+
+    def close(self):
+        os.close(self.fd)
+
+    # A press and release in one, for inputs with no release of their own
+    # (encoder detents, IR codes): reported as a click straight away.
+    @staticmethod
+    def tap(buttons, now):
+        return [Event(PRESS, buttons, now), Event(RELEASE, buttons, now),
+                Event(CLICK, buttons, now)]
+
+
+class EvdevSource(Source):
+    """ Keyboard, keypad or rotary encoder through the Linux input event
+        interface.  'keys' maps key codes to button bits, 'axes' maps a
+        relative axis to the buttons for (positive, negative) steps. """
+
+    # struct input_event: struct timeval, __u16 type, __u16 code, __s32 value
+    FORMAT = 'llHHi'
+    SIZE   = struct.calcsize(FORMAT)
+
+    KEYS = { KEY_UP: UP, KEY_DOWN: DOWN, KEY_LEFT: LEFT, KEY_RIGHT: RIGHT,
+             KEY_ENTER: SELECT, KEY_KPENTER: SELECT, KEY_SPACE: SELECT,
+             KEY_SELECT: SELECT, KEY_OK: SELECT,
+             KEY_KP8: UP, KEY_KP2: DOWN, KEY_KP4: LEFT, KEY_KP6: RIGHT,
+             KEY_KP5: SELECT, KEY_ESC: LEFT,
+             KEY_VOLUMEUP: UP, KEY_VOLUMEDOWN: DOWN,
+             KEY_CHANNELUP: RIGHT, KEY_CHANNELDOWN: LEFT }
+
+    AXES = { REL_DIAL: (UP, DOWN), REL_WHEEL: (UP, DOWN),
+             REL_X: (RIGHT, LEFT) }
+
+    def __init__(self, device, keys=None, axes=None, gestures=None):
+        Source.__init__(self, gestures)
+        if isinstance(device, str):
+            device = os.open(device, os.O_RDONLY | os.O_NONBLOCK)
+        self.fd     = device if isinstance(device, int) else device.fileno()
+        self.keys   = 0
+        self.keymap = self.KEYS if keys is None else keys
+        self.axes   = self.AXES if axes is None else axes
+        self.buffer = b''
+
+    @classmethod
+    def pack(cls, type, code, value, when=0.0):
+        """ An input_event as the kernel would send it (for tests) """
+        return struct.pack(cls.FORMAT, int(when),
+                           int(when % 1 * 1000000), type, code, value)
+
+    def read(self, now):
+        data = os.read(self.fd, 64 * self.SIZE)
+        if not data:
+            raise EOFError('input device closed')
+        self.buffer += data
+        events = []
+        keys   = self.keys
+        whole  = len(self.buffer) - len(self.buffer) % self.SIZE
+        for sec, usec, type, code, value in struct.iter_unpack(
+                self.FORMAT, self.buffer[:whole]):
+            if type == EV_KEY and code in self.keymap:
+                bit = self.keymap[code]
+                if value == 1:
+                    keys |= bit
+                elif value == 0:
+                    keys &= ~bit
+                else:
+                    # Autorepeat: a fresh press, so held keys step on
+                    events += [Event(PRESS, bit, now)]
+            elif type == EV_REL and code in self.axes and value:
+                bit = self.axes[code][0 if value > 0 else 1]
+                for step in range(min(abs(value), 8)):
+                    events += self.tap(bit, now)
+        self.buffer = self.buffer[whole:]
+        if keys != self.keys:
+            self.keys = keys
+            events = self.gestures.update(keys, now) + events
+        return events
+
+
+class LircSource(Source):
+    """ IR remote through lircd's socket, which sends a line per code
+        received: '<code> <repeat count> <button> <remote>'.  'buttons'
+        maps button names to button bits.  IR has no release, so each
+        code is a click; held buttons step on after 'delay' repeats. """
+
+    PATH    = '/var/run/lirc/lircd'
+    BUTTONS = { 'KEY_UP': UP, 'KEY_DOWN': DOWN,
+                'KEY_LEFT': LEFT, 'KEY_RIGHT': RIGHT,
+                'KEY_OK': SELECT, 'KEY_ENTER': SELECT,
+                'KEY_SELECT': SELECT, 'KEY_PLAY': SELECT,
+                'KEY_VOLUMEUP': UP, 'KEY_VOLUMEDOWN': DOWN,
+                'KEY_CHANNELUP': RIGHT, 'KEY_CHANNELDOWN': LEFT,
+                'KEY_NEXT': RIGHT, 'KEY_PREVIOUS': LEFT,
+                'KEY_BACK': LEFT, 'KEY_EXIT': LEFT }
+
+    def __init__(self, sock=PATH, buttons=None, delay=2):
+        Source.__init__(self)
+        if isinstance(sock, str):
+            path, sock = sock, socket.socket(socket.AF_UNIX,
+                                             socket.SOCK_STREAM)
+            sock.connect(path)
+        self.sock    = sock
+        self.fd      = sock if isinstance(sock, int) else sock.fileno()
+        self.buttons = self.BUTTONS if buttons is None else buttons
+        self.delay   = delay
+        self.buffer  = b''
+
+    def read(self, now):
+        if isinstance(self.sock, int):
+            data = os.read(self.sock, 4096)
+        else:
+            data = self.sock.recv(4096)
+        if not data:
+            raise EOFError('lircd closed the connection')
+        self.buffer += data
+        events = []
+        *lines, self.buffer = self.buffer.split(b'\n')
+        for line in lines:
+            fields = line.split()
+            # lircd also sends replies to commands, between BEGIN and END
+            if len(fields) != 4: continue
+            try:
+                repeat = int(fields[1], 16)
+            except ValueError:
+                continue
+            bit = self.buttons.get(fields[2].decode('ascii', 'replace'))
+            if bit is None: continue
+            if repeat == 0 or repeat >= self.delay:
+                events += self.tap(bit, now)
+        return events
+
+    def close(self):
+        if isinstance(self.sock, int):
+            os.close(self.sock)
+        else:
+            self.sock.close()
+
+
+class InputMux:
+    """ Waits on any number of sources and puts their events on queue """
+
+    def __init__(self, queue, sources=()):
+        self.queue    = queue
+        self.sources  = []
+        self.selector = selectors.DefaultSelector()
+        self.events   = 0     # Events queued so far
+        self.thread   = None
+        for source in sources:
+            self.add(source)
+
+    def add(self, source):
+        self.sources.append(source)
+        self.selector.register(source, selectors.EVENT_READ)
+
+    def remove(self, source):
+        self.selector.unregister(source)
+        self.sources.remove(source)
+        source.close()
+
+    def held(self):
+        """ Bitmask of buttons held down on any source """
+        held = 0
+        for source in self.sources:
+            held |= source.keys
+        return held
+
+    def start(self):
+        self.thread = Thread(target=self.run, name='inputmux')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        while self.sources:
+            self.step()
+
+    # Wait for input (or the next gesture timer) and queue the events.
+    def step(self, timeout=None):
+        due = [d for d in (s.deadline() for s in self.sources)
+               if d is not None]
+        if due:
+            wait    = max(min(due) - monotonic(), 0.0)
+            timeout = wait if timeout is None else min(timeout, wait)
+        ready = self.selector.select(timeout)
+        now   = monotonic()
+        for key, mask in ready:
+            try:
+                self.put(key.fileobj.read(now))
+            except BlockingIOError:
+                pass                      # Nothing there after all
+            except EOFError:
+                self.remove(key.fileobj)  # Unplugged, lircd stopped...
+            except (IOError, OSError):
+                traceback.print_exc()
+                self.remove(key.fileobj)
+        for source in self.sources:
+            self.put(source.timers(now))
+
+    def put(self, events):
+        for event in events:
+            self.queue.put(event)
+        self.events += len(events)
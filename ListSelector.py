@@ -6,10 +6,14 @@
 # allow quick access by picking letters progressively.
 # Uses up/down to go up and down where cursor is.
 # Move left/right to further filter to quickly get to item.
-# Still need to do case insensitive, and sort.
-from time import sleep
-from Adafruit_CharLCDPlate import Adafruit_CharLCDPlate
-from time                  import sleep
+# Items are shown in case-insensitive order, whatever order they come in:
+# the list is sorted once on case-folded keys, and up/down jump to the
+# previous/next distinct prefix by binary search, so each press costs
+# O(log n) however long the list is.
+# Display output goes through the passed Compositor, which owns the LCD,
+# and button presses come from the passed InputService.
+from bisect                import bisect_left
+from buttons               import PRESS
 
 # Buttons
 NONE           = 0x00
@@ -22,83 +26,88 @@ UP_AND_DOWN    = 0x0C
 LEFT_AND_RIGHT = 0x12
 
 class ListSelector:
-    def __init__(self, theList, theLcd):
-        self.list = []
+    def __init__(self, theList, theScreen, theInput):
+        items = []
         for item in theList:
-            if isinstance(item, basestring):
-                self.list.append(item)
+            if isinstance(item, str):
+                items.append(item)
             else:
-                self.list.append(item[0])
-        self.lcd = theLcd
-
-    def delay_milliseconds(milliseconds):
-       seconds = milliseconds / float(1000)	# divide milliseconds by 1000 for seconds
-       sleep(seconds)
+                items.append(item[0])
+        # order[i] is the index in theList of the i'th item in sorted order
+        self.order = sorted(range(len(items)),
+                            key=lambda i: items[i].casefold())
+        self.list = [items[i] for i in self.order]
+        self.keys = [item.casefold() for item in self.list]
+        self.screen = theScreen
+        self.lcd = theScreen.lcd
+        self.input = theInput
 
+    # Wait for a button to be pressed and return it
     def read_buttons(self):
-       buttons = self.lcd.buttons()
-       # Debounce push buttons
-       if(buttons != 0):
-          while(self.lcd.buttons() != 0):
-             delay_milliseconds(1)
-       return buttons
+       while True:
+          event = self.input.get()
+          if self.screen.touch():
+             continue
+          if event.kind == PRESS:
+             return event.buttons
+
+    # First item whose key starts with prefix, or where it would go
+    def first(self, prefix):
+        return bisect_left(self.keys, prefix)
+
+    # First item after every one whose key starts with prefix
+    def after(self, prefix):
+        if not prefix: return len(self.keys)
+        return bisect_left(self.keys, prefix[:-1] + chr(ord(prefix[-1]) + 1))
+
+    # Item to move to from item for UP (step -1) or DOWN (step 1): the
+    # first one with the previous/next distinct first curlen characters,
+    # among those sharing the first curlen-1 with it.  At either end of
+    # that group, UP stays on the first item with the current prefix and
+    # DOWN goes to the group's last item.
+    def step(self, item, curlen, step):
+        key    = self.keys[item]
+        prefix = key[:curlen]
+        parent = key[:curlen-1]
+        if step < 0:
+            here = self.first(prefix)
+            if here > self.first(parent):
+                return self.first(self.keys[here-1][:curlen])
+            return here
+        there = self.after(prefix)
+        if there < len(self.keys) and self.keys[there].startswith(parent):
+            return there
+        return there - 1
 
     def Pick(self):
-        sleep(0.5)
+        """ Let the user pick an item; returns its index in theList """
+        self.input.flush()
         curitem = 0
         curlen = 1
-        self.lcd.clear()
-        self.lcd.message(self.list[curitem])
-        self.lcd.home()
-        self.lcd.blink()
-        self.lcd.setCursor(0,0)
+        self.screen.show(self.list[curitem])
+        self.screen.call(self.lcd.blink)
+        self.screen.call(self.lcd.setCursor, 0, 0)
         while 1:
-            press = read_buttons()
-            #if self.lcd.buttonPressed(self.lcd.SELECT):
+            press = self.read_buttons()
             if (press == SELECT):
-                sleep(0.5)
                 break
-            #if self.lcd.buttonPressed(self.lcd.UP):
-            if (press == UP):
-                tempitem = curitem
-                prevstr = self.list[tempitem][:curlen]
-                while tempitem > 0 and self.list[tempitem-1][:curlen-1] == self.list[curitem][:curlen-1] and self.list[tempitem][:curlen] >= prevstr:
-                    tempitem -= 1
-                curitem = tempitem
-                # overwrite message, uses spaces to clear previous entries
-                self.lcd.home()
-                self.lcd.message(self.list[curitem]+'                ')
-                self.lcd.setCursor(curlen-1,0)
-                sleep(0.5)
-            #if self.lcd.buttonPressed(self.lcd.DOWN):
-            if (press == DOWN):
-                nextstr = self.list[curitem][:curlen-1]+chr(ord(self.list[curitem][curlen-1])+1)
-                tempitem = curitem
-                while tempitem+1 < len(self.list) and self.list[tempitem+1][:curlen-1] == self.list[curitem][:curlen-1] and self.list[tempitem] < nextstr:
-                    tempitem += 1
-                if tempitem < len(self.list):
-                    curitem = tempitem
-                # overwrite message, uses spaces to clear previous entries
-                self.lcd.home()
-                self.lcd.message(self.list[curitem]+'                ')
-                self.lcd.setCursor(curlen-1,0)
-                sleep(0.5)
-            #if self.lcd.buttonPressed(self.lcd.RIGHT):
+            if (press == UP) or (press == DOWN):
+                curitem = self.step(curitem, curlen, -1 if press == UP else 1)
+                # frames are padded, so no need to clear previous entries
+                self.screen.show(self.list[curitem])
+                self.screen.call(self.lcd.setCursor, curlen-1, 0)
             if (press == RIGHT):
                 if curlen < len(self.list[curitem]):
                     curlen += 1
-                self.lcd.setCursor(curlen-1,0)
-                self.lcd.blink()
-                sleep(0.5)
-            #if self.lcd.buttonPressed(self.lcd.LEFT):
+                self.screen.call(self.lcd.setCursor, curlen-1, 0)
+                self.screen.call(self.lcd.blink)
             if (press == LEFT):
                 if curlen > 1:
                     curlen -= 1
-                self.lcd.setCursor(curlen-1,0)
-                self.lcd.blink()
-                sleep(0.5)
+                self.screen.call(self.lcd.setCursor, curlen-1, 0)
+                self.screen.call(self.lcd.blink)
 
-        self.lcd.setCursor(0,0)
-        self.lcd.noBlink()
-        return curitem
+        self.screen.call(self.lcd.setCursor, 0, 0)
+        self.screen.call(self.lcd.noBlink)
+        return self.order[curitem]
 
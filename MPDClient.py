@@ -0,0 +1,362 @@
+# MPDClient.py
+#
+# A client for MPD's text protocol over one connection that stays open,
+# so a player command costs a round trip on a socket instead of forking
+# a shell and an mpc process for each one.
+#
+# Commands go out as lines ('play 3', 'setvol 40') and each answer is
+# zero or more 'key: value' lines ending in 'OK', or a single
+# 'ACK [error@index] {command} message' line, raised as MPDError.
+# Several commands can go out at once and be answered together:
+#
+#   pipeline()     sends them back to back, then reads every answer;
+#                  each runs (or fails) on its own.
+#   commandList()  wraps them in command_list_ok_begin/command_list_end,
+#                  so MPD runs them as one batch and stops at the first
+#                  that fails.
+#
+# MPD drops clients that stay idle too long (connection_timeout, 60 s
+# by default), and restarts now and then, so a command that finds the
+# connection gone reconnects and is sent once more.  Only failing to
+# reach MPD at all is reported, as MPDError.
+#
+# Every exchange is timed: stats() gives the count, mean and worst
+# round trip per command, and 'rtt' holds the latest one.
+#
+# One client can be shared between threads; exchanges take turns.
+# A client waiting in 'idle' can't send anything else, so a thread
+# watching for player events needs a client of its own: see Watcher,
+# which keeps a copy of the player's state current that way, without
+# polling.
+import os
+import select
+import socket
+import traceback
+from threading import Condition, Lock, Thread
+from time      import monotonic, sleep
+
+
+class MPDError(IOError):
+    """ MPD refused a command (code, command and message as it said),
+        or couldn't be reached """
+
+    def __init__(self, message, code=None, command=None):
+        IOError.__init__(self, message)
+        self.code    = code
+        self.command = command
+
+
+# Quote an argument for the command line, as the protocol wants
+def quote(arg):
+    arg = str(arg)
+    return '"' + arg.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+class MPDClient:
+    PORT    = 6600
+    TIMEOUT = 5.0  # Seconds to wait for MPD before giving up
+
+    def __init__(self, host=None, port=None, timeout=TIMEOUT):
+        # As mpc does: MPD_HOST and MPD_PORT if set; a host starting
+        # with '/' is a UNIX socket path
+        self.host       = host or os.environ.get('MPD_HOST', 'localhost')
+        self.port       = int(port or os.environ.get('MPD_PORT', self.PORT))
+        self.timeout    = timeout
+        self.lock       = Lock()
+        self.sock       = None
+        self.file       = None
+        self.version    = None  # Protocol version MPD greeted us with
+        self.connects   = 0     # Connections made, including reconnects
+        self.rtt        = 0.0   # Seconds the last exchange took
+        self.timing     = {}    # command -> [count, total, worst]
+
+    def connect(self):
+        self.close()
+        try:
+            if self.host.startswith('/'):
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.settimeout(self.timeout)
+                sock.connect(self.host)
+            else:
+                sock = socket.create_connection((self.host, self.port),
+                                                self.timeout)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.sock = sock
+            self.file = sock.makefile('rb')
+            hello = self.readLine()
+        except OSError as err:
+            self.close()
+            raise MPDError('Can\'t reach MPD at %s: %s'
+                           % (self.where(), err))
+        if not hello.startswith('OK MPD '):
+            self.close()
+            raise MPDError('%s isn\'t MPD: %r' % (self.where(), hello))
+        self.version   = hello[7:]
+        self.connects += 1
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+        if self.sock is not None:
+            self.sock.close()
+        self.sock = self.file = None
+
+    def where(self):
+        if self.host.startswith('/'): return self.host
+        return '%s:%d' % (self.host, self.port)
+
+    # ----------------------------------------------------------------------
+    # Sending commands
+
+    def command(self, name, *args):
+        """ Run a command; returns its answer as a list of (key, value) """
+        answer = self.exchange([(name,) + args], self.pipelined)[0]
+        if isinstance(answer, MPDError):
+            raise answer
+        return answer
+
+    def pipeline(self, commands):
+        """ Run a sequence of (name, arg...) commands in one exchange;
+            returns a list of answers, each a list of (key, value) pairs
+            or the MPDError the command failed with """
+        return self.exchange(commands, self.pipelined)
+
+    def commandList(self, commands):
+        """ Run a sequence of (name, arg...) commands as one batch;
+            returns a list of answers.  The first command to fail stops
+            the rest and raises MPDError. """
+        return self.exchange(commands, self.listed)
+
+    def idle(self, *subsystems, timeout=None):
+        """ Wait until something changes in one of the subsystems (any,
+            if none given), or at most timeout seconds if not None;
+            returns the names of those that changed """
+        # On timeout, noidle has MPD end the idle (with no changes)
+        def wait(commands):
+            if timeout is not None:
+                if not select.select([self.sock], [], [], timeout)[0]:
+                    self.sock.sendall(b'noidle\n')
+            return self.pipelined(commands)
+        answer = self.exchange([('idle',) + subsystems], wait,
+                               forever=True)[0]
+        if isinstance(answer, MPDError):
+            raise answer
+        return [value for key, value in answer if key == 'changed']
+
+    # Send the lines for commands and read the answers back with
+    # read(commands), reconnecting and trying once more if the connection
+    # has gone.  Timings are filed under the command's name, or under
+    # 'pipeline' or 'command_list' for several.  With forever set, the
+    # answer is waited for with no timeout.
+    def exchange(self, commands, read, forever=False):
+        with self.lock:
+            for retry in (True, False):
+                try:
+                    if self.sock is None:
+                        self.connect()
+                    self.sock.settimeout(None if forever else self.timeout)
+                    start = monotonic()
+                    self.sock.sendall(self.encode(commands, read))
+                    answers = read(commands)
+                    break
+                except MPDError:
+                    raise               # MPD answered, just not OK
+                except (OSError, EOFError) as err:
+                    self.close()
+                    if not retry:
+                        raise MPDError('Lost MPD at %s: %s'
+                                       % (self.where(), err))
+            self.rtt = monotonic() - start
+            if len(commands) == 1:
+                name = commands[0][0]
+            else:
+                name = 'command_list' if read == self.listed else 'pipeline'
+            timing = self.timing.setdefault(name, [0, 0.0, 0.0])
+            timing[0] += 1
+            timing[1] += self.rtt
+            timing[2]  = max(timing[2], self.rtt)
+        return answers
+
+    def encode(self, commands, read):
+        lines = [' '.join((name,) + tuple(quote(arg) for arg in args))
+                 for name, *args in commands]
+        if read == self.listed:
+            lines = ['command_list_ok_begin'] + lines + ['command_list_end']
+        return ''.join(line + '\n' for line in lines).encode('utf-8')
+
+    # ----------------------------------------------------------------------
+    # Reading answers
+
+    def readLine(self):
+        line = self.file.readline()
+        if not line.endswith(b'\n'):
+            raise EOFError('connection closed')
+        return line[:-1].decode('utf-8', 'replace')
+
+    # Raise the MPDError an ACK line describes:
+    # ACK [error@index] {command} message
+    @staticmethod
+    def error(line):
+        try:
+            code, rest = line[5:].split('@', 1)
+            index, rest = rest.split('] {', 1)
+            command, message = rest.split('} ', 1)
+            raise MPDError(message, int(code), command)
+        except ValueError:
+            raise MPDError(line[4:])
+
+    # One command's answer, up to 'end' (OK, or list_OK inside a list)
+    def reply(self, end='OK'):
+        pairs = []
+        while True:
+            line = self.readLine()
+            if line == end:
+                return pairs
+            if line.startswith('ACK '):
+                self.error(line)
+            key, sep, value = line.partition(': ')
+            pairs.append((key, value))
+
+    def pipelined(self, commands):
+        answers = []
+        for command in commands:
+            try:
+                answers.append(self.reply())
+            except MPDError as err:
+                answers.append(err)
+        return answers
+
+    # After an ACK, MPD sends nothing more for the list
+    def listed(self, commands):
+        answers = [self.reply('list_OK') for command in commands]
+        if self.readLine() != 'OK':
+            raise MPDError('Unexpected end of command list')
+        return answers
+
+    # ----------------------------------------------------------------------
+    # Timing
+
+    # Doesn't wait for the lock, which a client in idle holds indefinitely
+    def stats(self):
+        """ {command: (count, mean seconds, worst seconds)} """
+        return dict((name, (n, total / n, worst))
+                    for name, (n, total, worst) in list(self.timing.items()))
+
+    # ----------------------------------------------------------------------
+    # The commands radiopi uses
+
+    def status(self):
+        return dict(self.command('status'))
+
+    def currentsong(self):
+        return dict(self.command('currentsong'))
+
+    def play(self, position=None):
+        """ Play the playlist entry at position (from 0), or carry on """
+        if position is None: return self.command('play')
+        return self.command('play', position)
+
+    def stop(self):
+        return self.command('stop')
+
+    def pause(self, pause=True):
+        return self.command('pause', int(pause))
+
+    def toggle(self):
+        """ Pause if playing, play otherwise (as mpc toggle does);
+            returns True if now playing """
+        playing = self.status().get('state') == 'play'
+        if playing:
+            self.pause()
+        else:
+            self.play()
+        return not playing
+
+    def setvol(self, volume):
+        return self.command('setvol', volume)
+
+    def clear(self):
+        return self.command('clear')
+
+    def add(self, uri):
+        return self.command('add', uri)
+
+
+class Watcher:
+    """ Keeps a copy of the player's state, updated from a thread that
+        waits in 'idle' on a client of its own.  Readers look at the
+        attributes below; 'changes' goes up by one with every update,
+        and cond is notified. """
+
+    SUBSYSTEMS = ('player', 'mixer', 'playlist')
+    RETRY      = 5.0   # Seconds between attempts to reach MPD
+    # MPD says nothing when a stream it is tuning into starts to play,
+    # so while tuning() the status is looked at again this often
+    TUNING     = 1.0
+
+    def __init__(self, client):
+        self.client  = client
+        self.cond    = Condition()
+        self.changes = 0
+        self.state   = None  # 'play', 'pause' or 'stop'; None if unknown
+        self.bitrate = 0     # kbit/s, 0 until audio is flowing
+        self.elapsed = 0.0   # Seconds into the song as of 'sampled'
+        self.sampled = 0.0   # monotonic() time of the last update
+        self.volume  = None
+        self.song    = None  # Playlist position playing
+        self.name    = None  # Stream name (icy-name)
+        self.title   = None  # Song or stream title (ICY StreamTitle)
+        self.error   = None  # MPD's error, or why it can't be reached
+        self.thread  = None
+
+    def start(self):
+        self.thread = Thread(target=self.run, name='mpdwatch')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        while True:
+            try:
+                self.refresh()
+                while True:
+                    self.client.idle(*self.SUBSYSTEMS, timeout=(
+                        self.TUNING if self.tuning() else None))
+                    self.refresh()
+            except IOError as err:
+                self.update(state=None, bitrate=0, error=str(err))
+            except Exception:
+                traceback.print_exc()
+            sleep(self.RETRY)
+
+    # Read status and the current song in one go, and take them in
+    def refresh(self):
+        status, song = self.client.commandList([('status',),
+                                                ('currentsong',)])
+        status, song = dict(status), dict(song)
+        self.update(state   = status.get('state'),
+                    bitrate = int(status.get('bitrate', 0)),
+                    elapsed = float(status.get('elapsed', 0)),
+                    volume  = int(status.get('volume', -1)),
+                    song    = (int(status['song']) if 'song' in status
+                               else None),
+                    name    = song.get('Name'),
+                    title   = song.get('Title'),
+                    error   = status.get('error'))
+
+    def update(self, **values):
+        with self.cond:
+            for name, value in values.items():
+                setattr(self, name, value)
+            self.sampled  = monotonic()
+            self.changes += 1
+            self.cond.notify_all()
+
+    def tuning(self):
+        """ True while playing but no audio has come through yet:
+            connecting to the stream, or buffering """
+        return self.state == 'play' and not self.bitrate
+
+    def position(self):
+        """ Seconds into the song now """
+        if self.state != 'play': return self.elapsed
+        return self.elapsed + monotonic() - self.sampled
@@ -0,0 +1,82 @@
+# Marquee.py
+#
+# Scrolls text too wide for the display using the HD44780's own display
+# shift.  Each line of DDRAM is 40 characters wide, of which only the
+# first 16 are normally in view; the text is loaded into DDRAM once and
+# every scroll step after that is a single 'shift display left' command
+# instead of a rewrite of the line.  Text longer than 40 characters is
+# fed in through the columns that are out of view, a chunk at a time.
+#
+# The shift applies to the whole display, so every line scrolls together.
+# Lines that fit in 40 characters simply go round with DDRAM.
+
+
+class Marquee:
+    GAP = '    '   # Spacing between the end of a line and its repeat
+
+    def __init__(self, lcd, cols=16, rows=2):
+        self.lcd    = lcd
+        self.cols   = cols
+        self.rows   = rows
+        self.width  = lcd.DDRAM_COLS
+        self.active = False
+        self.text   = None
+        self.steps  = 0     # Scroll steps taken since start()
+
+    def start(self, text):
+        """ Load text (newline separated lines) and stop at position 0 """
+        self.text  = text
+        self.lines = []
+        for line in text.split('\n')[:self.rows]:
+            # A line that fits in DDRAM goes round there, with as much of
+            # the gap as fits; only longer ones need refilling
+            if len(line) > self.width:
+                line += self.GAP
+            elif len(line) > self.cols:
+                line = (line + self.GAP)[:self.width]
+            self.lines.append(line)
+        self.refill = any(len(line) > self.width for line in self.lines)
+        self.pos    = 0
+        self.ahead  = self.width # Text positions [0, ahead) are in DDRAM
+        lcd = self.lcd
+        lcd.beginFrame()
+        if lcd.shift:
+            lcd.home()
+        for row, line in enumerate(self.lines):
+            lcd.setCursor(0, row)
+            lcd.message(line[:self.width].ljust(self.width))
+        lcd.endFrame()
+        self.active = True
+
+    def step(self):
+        """ Scroll one character to the left """
+        lcd = self.lcd
+        lcd.beginFrame()
+        # The next step brings text position pos + cols into view.  If it
+        # isn't loaded yet, load everything up to the column just left of
+        # the view, which is as far ahead as DDRAM allows.
+        if self.refill and self.pos + self.cols >= self.ahead:
+            end = self.pos + self.width
+            for row, line in enumerate(self.lines):
+                if len(line) <= self.width:
+                    continue
+                k = self.ahead
+                while k < end:
+                    col = k % self.width
+                    n   = min(end - k, self.width - col)
+                    lcd.setCursor(col, row)
+                    lcd.message(''.join(line[(k + i) % len(line)]
+                                        for i in range(n)))
+                    k += n
+            self.ahead = end
+        lcd.scrollDisplayLeft()
+        lcd.endFrame()
+        self.pos   += 1
+        self.steps += 1
+
+    def stop(self):
+        """ Undo any display shift so normal output lines up again """
+        if self.lcd.shift:
+            self.lcd.home()
+        self.active = False
+        self.text   = None
@@ -0,0 +1,88 @@
+# Mixer.py
+#
+# Sends volume changes to the player from a worker thread (a Debouncer),
+# so a volume ramp never waits on the player.  Callers set() an absolute
+# volume as often as they like; only the latest one is kept, and it is
+# sent at most 'rate' times a second, so a sweep from 20 to 80 costs a
+# handful of writes instead of one per step.  settle() asks for one more
+# write of the final volume once the ramp is over, in case the player
+# clamped or lost one of the writes during it.
+#
+# mute() silences the player without stopping it, so the stream stays
+# connected and unmuting is immediate.  The volume fades to 0 (or back
+# up) over a given time, in steps on a fixed schedule from when the
+# fade began: a step that comes late goes straight to the level due by
+# then, so the fade ends on time however slow the player is to answer.
+# While muted, set() only changes the volume to come back to.
+from time      import monotonic
+from Debouncer import Debouncer
+
+
+class Mixer(Debouncer):
+    FADE_STEP = 0.01  # Seconds between volume steps during a fade
+
+    def __init__(self, send, rate=5, volume=None):
+        # send(volume) sets the player's volume; volume is the one it
+        # has to start with, if known
+        Debouncer.__init__(self, send, rate, value=volume)
+        self.volume   = volume    # Latest volume set(), muted or not
+        self.muted    = False
+        self.fadeFrom = None      # Volume a fade started at; None: no fade
+        self.fadeTo   = None      # ...the volume it ends at
+        self.fadeLen  = 0.0       # ...how many seconds it takes
+        self.fadeAt   = 0.0       # ...when it started
+        self.nextStep = 0.0       # ...and when its next step is due
+
+    def set(self, volume):
+        """ Make volume the next one sent, replacing any not yet sent """
+        with self.cond:
+            Debouncer.set(self, volume)
+            self.volume = volume
+            if self.fadeFrom is not None and not self.muted:
+                self.fadeTo = volume    # Fading in: to the new volume
+
+    def mute(self, muted=True, fade=0.0):
+        """ Fade the volume to 0 (or back to the latest set()) over fade
+            seconds, without stopping the player """
+        with self.cond:
+            if muted == self.muted:
+                return
+            self.muted = muted
+            goal  = 0 if muted else self.volume
+            level = self.sent if self.sent is not None else self.volume
+            if goal is None:
+                return                  # No volume to come back to yet
+            if level is None:
+                level = goal
+            self.fadeFrom = level
+            self.fadeTo   = goal
+            self.fadeLen  = fade
+            self.fadeAt   = self.nextStep = monotonic()
+            self.cond.notify_all()
+
+    # Volume due by now in the fade in progress; also works out when the
+    # next step is due, or ends the fade once it's over.
+    def fadeStep(self, now):
+        done = now - self.fadeAt
+        if done >= self.fadeLen:
+            self.fadeFrom = None
+            return self.fadeTo
+        steps         = int(done / self.FADE_STEP) + 1
+        self.nextStep = self.fadeAt + steps * self.FADE_STEP
+        return int(round(self.fadeFrom +
+                         (self.fadeTo - self.fadeFrom) * done / self.fadeLen))
+
+    # A fade in progress goes first, a step at a time; set() volumes
+    # wait for it to end.
+    def due(self, now):
+        while self.fadeFrom is not None:
+            wait = self.nextStep - now
+            if wait > 0:
+                return None, wait
+            volume = self.fadeStep(now)
+            if volume != self.sent or self.fadeFrom is None:
+                return volume, None
+        # Muted: the volume is kept for unmuting only
+        if self.muted:
+            self.target = None
+        return Debouncer.due(self, now)
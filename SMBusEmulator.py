@@ -0,0 +1,464 @@
+# SMBusEmulator.py
+#
+# Pure Python stand-in for smbus.SMBus with an Adafruit RGB LCD Pi Plate
+# on the other end: an MCP23017 port expander (both register banks, byte
+# and sequential modes, interrupt-on-change) wired to an HD44780 LCD
+# controller (4-bit interface, DDRAM, CGRAM, display shift, busy flag)
+# exactly as the plate is.  Lets the display and button code run, be
+# benchmarked and be checked on machines with no /dev/i2c-*.
+#
+# Bus time is modelled at the configured clock (100 kHz standard mode,
+# 400 kHz fast mode): every transaction adds the time its bits take on
+# the wire, and each byte written to the port expander takes effect at
+# the moment its last bit would have arrived.  With realtime=True (the
+# default) wall-clock time passes as well, so sleeps in the driver count;
+# with realtime=False only bus time passes, for repeatable runs, and the
+# driver's waits (timed mode's, see Adafruit_CharLCDPlate.settle()) go
+# through monotonic() and sleep() here, which move the emulated clock
+# on instead of passing real time.  With paced=True each transaction
+# really takes its time on the wire (it sleeps), as on hardware, for
+# measuring threads contending for the bus.
+#
+# Selected through Adafruit_I2C(..., bus='emulator') or by setting the
+# environment variable I2C_EMULATOR (to 100k or 400k, say).
+#
+#   bus = SMBusEmulator(speed=400000)
+#   lcd = Adafruit_CharLCDPlate(bus=bus)
+#   lcd.message('Hello')
+#   bus.assertScreen('Hello')
+#   bus.setButtons(1 << lcd.UP)
+import errno
+from time import monotonic, sleep
+
+
+class SMBusEmulator:
+
+    # MCP23017 registers, in the order they appear per port in bank 1
+    IODIR, IPOL, GPINTEN, DEFVAL, INTCON, IOCON, GPPU, INTF, INTCAP, \
+        GPIO, OLAT = range(11)
+    NAMES = ('IODIR', 'IPOL', 'GPINTEN', 'DEFVAL', 'INTCON', 'IOCON',
+             'GPPU', 'INTF', 'INTCAP', 'GPIO', 'OLAT')
+
+    IOCON_BANK  = 0b10000000
+    IOCON_SEQOP = 0b00100000  # Set = byte mode (no pointer increment)
+
+    # PORTB wiring on the plate
+    RS, RW, E   = 0b10000000, 0b01000000, 0b00100000
+    DATA        = 0b00011110  # D4..D7 on PB4..PB1, reversed
+    BLUE        = 0b00000001
+    BUTTONS     = 0b00011111  # PA0..PA4: SELECT, RIGHT, DOWN, UP, LEFT
+
+    # HD44780 execution times, seconds
+    T_SLOW      = 0.00152     # Clear display, return home
+    T_FAST      = 0.000037    # Everything else (data writes: 41 us)
+    T_DATA      = 0.000041
+
+    def __init__(self, busnum=1, speed=100000, address=0x20, realtime=True,
+                 paced=False):
+        self.busnum   = busnum
+        self.speed    = speed
+        self.address  = address
+        self.realtime = realtime or paced
+        self.paced    = paced
+        self.started  = monotonic()
+        self.busTime  = 0.0   # Seconds spent on the wire so far
+        self.slept    = 0.0   # Seconds slept in emulated time (sleep())
+        self.log      = []    # (time, operation, register, data) per transaction
+        self.transactions = 0
+        self.failures = 0     # Transactions still to fail (see failNext())
+        self.pressed  = 0     # Buttons held down, bitmask
+        self.events   = []    # Scripted (time, buttons) changes, in order
+        self.violations = []  # (time, what) written while the LCD was busy
+        self.resetExpander()
+        self.resetLcd()
+
+    # ----------------------------------------------------------------------
+    # Emulated time
+
+    def clock(self):
+        """ Current emulated time in seconds """
+        if self.paced:
+            return monotonic() - self.started
+        if self.realtime:
+            return monotonic() - self.started + self.busTime
+        return self.busTime + self.slept
+
+    # For a driver that times things itself: the clock to time them by,
+    # and a sleep that lets that clock run on.
+    def monotonic(self):
+        return self.clock()
+
+    def sleep(self, seconds):
+        if self.realtime:
+            sleep(seconds)
+        elif seconds > 0:
+            self.slept += seconds
+
+    # Start a transaction of 'bits' bits on the wire: apply any scripted
+    # button changes that are due, and advance the clock.  Returns the
+    # time the transaction started.
+    def transaction(self, operation, register, data, bits):
+        if self.failures:
+            self.failures -= 1
+            raise IOError(errno.EREMOTEIO, 'Remote I/O error (emulated)')
+        start = self.clock()
+        self.runScript(start)
+        self.busTime += bits / float(self.speed)
+        if self.paced: sleep(bits / float(self.speed))
+        self.transactions += 1
+        self.log.append((start, operation, register, data))
+        return start
+
+    def failNext(self, count=1):
+        """ Make the next count transactions fail with IOError """
+        self.failures = count
+
+    def clearLog(self):
+        self.log = []
+
+    # ----------------------------------------------------------------------
+    # smbus.SMBus interface.  Bit counts include start, address and
+    # acknowledge bits, and a repeated start for reads from a register.
+
+    def check(self, addr):
+        if addr != self.address:
+            raise IOError(errno.ENXIO, 'No such device or address (emulated)')
+
+    def write_byte(self, addr, value):
+        self.check(addr)
+        self.transaction('write_byte', None, [value], 20)
+        self.pointer = value
+
+    def read_byte(self, addr):
+        self.check(addr)
+        self.transaction('read_byte', None, [], 20)
+        return self.readRegister(self.pointer)
+
+    def write_byte_data(self, addr, reg, value):
+        self.write_i2c_block_data(addr, reg, [value], 'write_byte_data')
+
+    def write_word_data(self, addr, reg, value):
+        self.write_i2c_block_data(addr, reg, [value & 0xFF, value >> 8],
+                                  'write_word_data')
+
+    def read_byte_data(self, addr, reg):
+        return self.read_i2c_block_data(addr, reg, 1, 'read_byte_data')[0]
+
+    def write_i2c_block_data(self, addr, reg, data,
+                             operation='write_i2c_block_data'):
+        self.check(addr)
+        if len(data) > 32:
+            raise IOError(errno.EINVAL, 'Block write over 32 bytes')
+        start = self.transaction(operation, reg, list(data),
+                                 9 * (2 + len(data)) + 2)
+        self.pointer = reg
+        for i, value in enumerate(data):
+            # Byte i lands after the address, register and i+1 data bytes
+            self.writeRegister(self.pointer, value & 0xFF,
+                               start + 9 * (3 + i) / float(self.speed))
+            self.advance()
+
+    def read_i2c_block_data(self, addr, reg, length=32,
+                            operation='read_i2c_block_data'):
+        self.check(addr)
+        self.transaction(operation, reg, [], 9 * (3 + length) + 3)
+        self.pointer = reg
+        data = []
+        for i in range(length):
+            data.append(self.readRegister(self.pointer))
+            self.advance()
+        self.log[-1] = self.log[-1][:3] + (data,)
+        return data
+
+    # ----------------------------------------------------------------------
+    # MCP23017
+
+    def resetExpander(self):
+        self.reg = [[0, 0] for name in self.NAMES]
+        self.reg[self.IODIR] = [0xFF, 0xFF]
+        self.pointer = 0
+        self.pins    = [self.inputPins(0), 0]
+
+    def bank(self):
+        return 1 if self.reg[self.IOCON][0] & self.IOCON_BANK else 0
+
+    # Map a register address to (register, port), or None if unused.
+    def decode(self, address):
+        if self.bank():
+            register, port = address & 0x0F, address >> 4
+            if port > 1 or register > self.OLAT: return None
+            return register, port
+        if address > 2 * self.OLAT + 1: return None
+        return address >> 1, address & 1
+
+    def encode(self, register, port):
+        if self.bank(): return (port << 4) | register
+        return (register << 1) | port
+
+    # Move the address pointer on after a byte, as IOCON says.
+    def advance(self):
+        iocon = self.reg[self.IOCON][0]
+        if iocon & self.IOCON_SEQOP:
+            if not iocon & self.IOCON_BANK:
+                self.pointer ^= 1    # Bank 0 byte mode toggles A/B pair
+            return
+        where = self.decode(self.pointer)
+        if where is None: return
+        register, port = where
+        if self.bank():
+            register = (register + 1) % (self.OLAT + 1)
+        else:
+            port ^= 1
+            if port == 0: register = (register + 1) % (self.OLAT + 1)
+        self.pointer = self.encode(register, port)
+
+    def writeRegister(self, address, value, when):
+        where = self.decode(address)
+        if where is None: return
+        register, port = where
+        if register == self.IOCON:
+            self.reg[self.IOCON] = [value, value]    # One shared register
+        elif register in (self.GPIO, self.OLAT):
+            self.reg[self.OLAT][port] = value
+            if port == 1: self.portB(when)
+        elif register not in (self.INTF, self.INTCAP):
+            self.reg[register][port] = value
+            if register == self.IODIR and port == 1: self.portB(when)
+
+    def readRegister(self, address):
+        where = self.decode(address)
+        if where is None: return 0
+        register, port = where
+        if register == self.GPIO:
+            self.reg[self.INTF][port] = 0   # Reading GPIO clears interrupt
+            return self.gpio(port)
+        if register == self.INTCAP:
+            self.reg[self.INTF][port] = 0
+        return self.reg[register][port]
+
+    # Value read from a GPIO register: inputs (after polarity) and the
+    # latched value of outputs.
+    def gpio(self, port):
+        iodir = self.reg[self.IODIR][port]
+        pins  = self.pins[port] if port == 0 else self.lcdPins()
+        value = (pins ^ self.reg[self.IPOL][port]) & iodir
+        return value | (self.reg[self.OLAT][port] & ~iodir & 0xFF)
+
+    # External levels on port A: buttons pull their pin low when pressed.
+    def inputPins(self, pressed):
+        return 0xFF & ~(pressed & self.BUTTONS)
+
+    # Pins changed: raise interrupt-on-change as configured.
+    def pinsChanged(self, port, old):
+        new     = self.pins[port]
+        enabled = self.reg[self.GPINTEN][port] & self.reg[self.IODIR][port]
+        compare = self.reg[self.INTCON][port]
+        against = (self.reg[self.DEFVAL][port] & compare) | (old & ~compare)
+        fired   = (new ^ against) & enabled
+        if fired and not self.reg[self.INTF][port]:
+            self.reg[self.INTF][port]   = fired
+            self.reg[self.INTCAP][port] = self.gpio(port)
+
+    # ----------------------------------------------------------------------
+    # Buttons
+
+    def setButtons(self, pressed):
+        """ Press exactly the buttons in the bitmask, release the rest """
+        self.pressed = pressed
+        old = self.pins[0]
+        self.pins[0] = self.inputPins(pressed)
+        if old != self.pins[0]: self.pinsChanged(0, old)
+
+    def script(self, events):
+        """ Schedule (delay in seconds, buttons bitmask) changes, applied
+            as emulated time passes them """
+        now = self.clock()
+        for delay, pressed in events:
+            self.events.append((now + delay, pressed))
+        self.events.sort(key=lambda event: event[0])
+
+    def runScript(self, now):
+        while self.events and self.events[0][0] <= now:
+            self.setButtons(self.events.pop(0)[1])
+
+    # ----------------------------------------------------------------------
+    # HD44780
+
+    def resetLcd(self):
+        self.ddram   = bytearray(b' ' * 0x68)
+        self.cgram   = bytearray(64)
+        self.ac      = 0
+        self.cgmode  = False
+        self.nibbles = False   # 4-bit interface selected
+        self.pending = None    # High nibble waiting for the low one
+        self.lines   = 1
+        self.increment  = True
+        self.autoshift  = False
+        self.displayOn  = False
+        self.cursorOn   = False
+        self.blinkOn    = False
+        self.shift      = 0
+        self.busyUntil  = 0.0
+        self.readNibble = 0    # Which half a read strobe returns next
+        self.lastB      = 0
+        self.instructions = 0
+
+    # Port B pin levels as the LCD sees them, after a write to OLATB or
+    # IODIRB at time 'when'.  Only outputs are driven by the expander.
+    def portB(self, when):
+        iodir = self.reg[self.IODIR][1]
+        value = self.reg[self.OLAT][1] & ~iodir & 0xFF
+        last, self.lastB = self.lastB, value
+        if value & self.RW:
+            if value & self.E and not last & self.E:
+                self.readNibble ^= 1
+            return
+        self.readNibble = 0
+        if last & self.E and not value & self.E:
+            self.strobe(value, when)   # Data latched on falling edge of E
+
+    def strobe(self, pins, when):
+        data = self.unflip(pins)
+        rs   = bool(pins & self.RS)
+        if not self.nibbles:
+            # 8-bit interface (after power-up): D0-D3 aren't wired, so
+            # every strobe is a whole instruction with the low bits 0.
+            self.execute(rs, data << 4, when)
+        elif self.pending is None:
+            self.pending = data
+        else:
+            value, self.pending = (self.pending << 4) | data, None
+            self.execute(rs, value, when)
+
+    # D7 is on PB1 and D4 on PB4
+    @staticmethod
+    def unflip(pins):
+        return (((pins >> 4) & 1) | ((pins >> 2) & 2) |
+                (pins & 4) | ((pins << 2) & 8))
+
+    def busy(self):
+        return self.clock() < self.busyUntil
+
+    def execute(self, rs, value, when):
+        if when < self.busyUntil:
+            self.violations.append((when, ('data ' if rs else 'command ')
+                                    + '0x%02X' % value))
+        self.instructions += 1
+        took = self.T_FAST
+        if rs:
+            took = self.T_DATA
+            if self.cgmode:
+                self.cgram[self.ac & 0x3F] = value
+            else:
+                self.ddram[self.ac] = value
+            self.step()
+        elif value & 0x80:                   # Set DDRAM address
+            self.ac, self.cgmode = self.ddramAddress(value & 0x7F), False
+        elif value & 0x40:                   # Set CGRAM address
+            self.ac, self.cgmode = value & 0x3F, True
+        elif value & 0x20:                   # Function set
+            self.nibbles = not value & 0x10
+            self.lines   = 2 if value & 0x08 else 1
+        elif value & 0x10:                   # Cursor or display shift
+            step = 1 if value & 0x04 else -1
+            if value & 0x08:
+                self.shift = (self.shift - step) % 40
+            else:
+                self.move(step)
+        elif value & 0x08:                   # Display on/off control
+            self.displayOn = bool(value & 0x04)
+            self.cursorOn  = bool(value & 0x02)
+            self.blinkOn   = bool(value & 0x01)
+        elif value & 0x04:                   # Entry mode set
+            self.increment = bool(value & 0x02)
+            self.autoshift = bool(value & 0x01)
+        elif value & 0x02:                   # Return home
+            self.ac, self.cgmode, self.shift = 0, False, 0
+            took = self.T_SLOW
+        elif value & 0x01:                   # Clear display
+            self.ddram[:] = b' ' * len(self.ddram)
+            self.ac, self.cgmode, self.shift = 0, False, 0
+            self.increment = True
+            took = self.T_SLOW
+        self.busyUntil = max(when, self.busyUntil) + took
+
+    def ddramAddress(self, address):
+        if self.lines == 2 and 0x28 <= address < 0x40: return 0x40
+        if address > 0x67: return 0
+        return address
+
+    # Address counter step after a data read or write
+    def step(self):
+        if self.cgmode:
+            self.ac = (self.ac + (1 if self.increment else -1)) & 0x3F
+            return
+        self.move(1 if self.increment else -1)
+        if self.autoshift:
+            self.shift = (self.shift + (1 if self.increment else -1)) % 40
+
+    def move(self, step):
+        if self.lines == 1:
+            self.ac = (self.ac + step) % 0x50
+            return
+        row, col = (1, self.ac - 0x40) if self.ac >= 0x40 else (0, self.ac)
+        index    = (row * 40 + col + step) % 80
+        self.ac  = (0x40 + index - 40) if index >= 40 else index
+
+    # Levels the LCD drives onto PB1-PB4 during a read (RW=1, E=1): the
+    # busy flag and address counter, high nibble then low nibble.
+    def lcdPins(self):
+        b = self.lastB
+        if not (b & self.RW and b & self.E): return 0
+        value = (0x80 if self.busy() else 0) | (self.ac & 0x7F)
+        nibble = (value >> 4) if self.readNibble else (value & 0x0F)
+        return (((nibble & 1) << 4) | ((nibble & 2) << 2) |
+                (nibble & 4) | ((nibble & 8) >> 2))
+
+    # ----------------------------------------------------------------------
+    # Inspection
+
+    def row(self, row, cols=16):
+        """ Visible text of a display row (CGRAM codes come out as
+            chr(0)..chr(7)), allowing for display shift """
+        base = 0x40 * row
+        return ''.join(chr(self.ddram[base + (self.shift + col) % 40])
+                       for col in range(cols))
+
+    def screen(self, cols=16, rows=2):
+        """ List of the visible rows, blank while the display is off """
+        if not self.displayOn: return [' ' * cols] * rows
+        return [self.row(row, cols) for row in range(rows)]
+
+    def backlight(self):
+        """ Backlight colour as the plate's RED/GREEN/BLUE bitmask """
+        a, b = self.reg[self.OLAT]
+        return ((0 if a & 0x40 else 1) | (0 if a & 0x80 else 2) |
+                (0 if b & self.BLUE else 4))
+
+    def glyph(self, slot):
+        """ Bitmap in CGRAM slot 0-7 """
+        return list(self.cgram[slot * 8:slot * 8 + 8])
+
+    def assertScreen(self, *lines):
+        """ Check the visible rows start with the given text """
+        screen = self.screen()
+        for row, line in enumerate(lines):
+            if screen[row][:len(line)] != line:
+                raise AssertionError('LCD row %d is %r, expected %r'
+                                     % (row, screen[row], line))
+
+    def assertIdle(self):
+        """ Check nothing was sent to the LCD while it was busy """
+        if self.violations:
+            raise AssertionError('%d writes while LCD busy, first: %s at %f'
+                                 % (len(self.violations),
+                                    self.violations[0][1],
+                                    self.violations[0][0]))
+
+    def assertTransactions(self, count, operation=None):
+        """ Check the number of logged transactions (of one kind) """
+        logged = [entry for entry in self.log
+                  if operation is None or entry[1] == operation]
+        if len(logged) != count:
+            raise AssertionError('%d transactions logged, expected %d'
+                                 % (len(logged), count))
@@ -1,121 +1,170 @@
-import utils
-
-# NOTE: Code taken from
-# http:##jmsarduino.blogspot.com/2009/10/4-way-button-click-double-click-hold.html
-# 4-Way Button: Click, Double-Click, Press+Hold, and Press+Long-Hold
-# By Jeff Saltzman
-# Oct. 13, 2009
-
-
-# Button timing variables
-# ms debounce period to avoid flickering when pressing or releasing the button
-dbounce = 20
-# max ms between clicks for a double click event
-DCgap = 250
-# ms hold period: how long to wait for press+hold event
-holdTime = 2000
-# ms long hold period: how long to wait for press+hold event
-longHoldTime = 5000
-
-# Button click type
-PRESS_NONE = 0x00
-PRESS_CLICK = 0x01
-PRESS_DCLICK = 0x02
-PRESS_LONG = 0x04
-PRESS_HOLD = 0x08
-
-
-class Button:
-    def __init__(self, buttonType):
-        self.buttonType = buttonType
-
-        # Button variables
-        # value read from button
-        this.buttonVal = True
-        # buffered value of the button's previous state
-        this.buttonLast = True
-        # whether we're waiting for a double click (down)
-        this.DCwaiting = False
-        # whether to register a double click on next release,
-        # or whether to wait and click
-        this.DConUp = False
-        # whether it's OK to do a single click
-        this.singleOK = True
-        # time the button was pressed down
-        this.downTime = -1
-        # time the button was released
-        this.upTime = -1
-        # whether to ignore the button release because the
-        # click+hold was triggered
-        this.ignoreUp = False
-        # when held, whether to wait for the up event
-        this.waitForUp = False
-        # whether not the hold event happened already
-        this.holdEventPast = False
-        # whether the long hold event happened already
-        this.longHoldEventPast = False
-
-    # Check to see if button pressed or held
-    # Return Values
-    # 1) Click: rapid press and release
-    # 2) Double-Click: two clicks in quick succession
-    # 3) Press and Hold: holding the button down
-    # 4) Long Press and Hold: holding the button down for a long time
-    def checkButton():
-        int event = PRESS_NONE
-        # Read the state of the button
-        this.buttonVal = digitalRead(buttonPin)
-        # Button pressed down
-        if (this.buttonVal == LOW and this.buttonLast == HIGH and
-                (millis() - this.upTime) > debounce):
-            this.downTime = millis()
-            this.ignoreUp = False
-            this.waitForUp = False
-            this.singleOK = True
-            this.holdEventPast = False
-            this.longHoldEventPast = False
-            if (millis()-this.upTime) < DCgap
-            and not this.DConUp and this.DCwaiting:
-                this.DConUp = True
+# buttons.py
+#
+# Button gesture engine: turns samples of the plate's button bitmask
+# (one bit per button, as returned by Adafruit_CharLCDPlate.buttons())
+# into click, double-click, hold, long-hold and chord events.
+#
+# Based on the 4-Way Button sketch (Click, Double-Click, Press+Hold and
+# Press+Long-Hold) by Jeff Saltzman, Oct. 13, 2009:
+# http://jmsarduino.blogspot.com/2009/10/4-way-button-click-double-click-hold.html
+# but all buttons are handled at once: state is kept as bitmasks, one
+# bit per button, and each sample is a handful of bitwise operations.
+# Only buttons with a timer running are looked at one by one.
+#
+# Nothing here blocks or sleeps.  Feed it a sample whenever the buttons
+# are read, and call update() with no new sample when deadline() says a
+# timer is due, so clicks, holds and changes held back by the debounce
+# are reported while nothing changes:
+#
+#   gestures = Gestures()
+#   for event in gestures.update(lcd.buttons()):
+#       if event.kind == CLICK and event.buttons == 1 << lcd.UP: ...
+from collections import namedtuple
+from time        import monotonic
+
+# Event kinds
+PRESS     = 1  # A button went down on its own
+RELEASE   = 2  # Button(s) went up
+CLICK     = 3  # Pressed and released, no second click followed
+DOUBLE    = 4  # Two clicks in quick succession
+HOLD      = 5  # Held down for 'hold' seconds
+LONG_HOLD = 6  # Held down for 'longHold' seconds
+CHORD     = 7  # Two or more buttons down together
+
+NAMES = { PRESS: 'PRESS', RELEASE: 'RELEASE', CLICK: 'CLICK',
+          DOUBLE: 'DOUBLE', HOLD: 'HOLD', LONG_HOLD: 'LONG_HOLD',
+          CHORD: 'CHORD' }
+
+# kind is one of the above; buttons the bitmask of buttons involved (all
+# of them for a chord, one per event otherwise, except RELEASE which
+# covers every button that went up in the same sample).  A button going
+# down gives a PRESS, or a CHORD instead if others are down with it: it
+# doesn't PRESS on its way into a chord.  One that was already down has
+# PRESSed by then, so act on its CLICK or HOLD where a chord should
+# count on its own.
+Event = namedtuple('Event', 'kind buttons time')
+
+
+# Indices of the set bits of mask
+def bits(mask):
+    i = 0
+    while mask:
+        if mask & 1: yield i
+        mask >>= 1
+        i    += 1
+
+
+class Gestures:
+
+    def __init__(self, debounce=0.02, double=0.25, hold=2.0, longHold=5.0,
+                 doubles=0b11111, count=5):
+        self.debounce = debounce # Seconds a button ignores changes after one
+        self.double   = double   # Max seconds between clicks of a double
+        self.hold     = hold     # Seconds down before HOLD
+        self.longHold = longHold # Seconds down before LONG_HOLD
+        # Buttons that can double-click.  Clicks on these are reported
+        # only once 'double' has passed without a second one; the rest
+        # click as soon as they're released.
+        self.doubles  = doubles
+        self.downTime = [0.0] * count
+        self.upTime   = [0.0] * count
+        self.reset()
+
+    def reset(self, state=0):
+        """ Start over with the buttons in state already down; those
+            give no events until released (a RELEASE only) """
+        self.state    = state  # Debounced buttons down
+        self.raw      = state  # Last sample
+        self.changed  = [0.0] * len(self.downTime) # Last accepted edge
+        self.locked   = 0      # Changed less than 'debounce' ago
+        self.waiting  = 0      # Clicked once, may become a double
+        self.second   = 0      # Down for the second click of a double
+        self.held     = 0      # HOLD reported since going down
+        self.longHeld = 0      # LONG_HOLD reported since going down
+        self.consumed = state  # No click or hold: in a chord, or flushed
+
+    def update(self, sample=None, now=None):
+        """ Take a button bitmask sample (or None: no change since the
+            last one) and return the list of events it gives, oldest first """
+        if now is None: now = monotonic()
+        if sample is None: sample = self.raw
+        self.raw = sample
+        events   = []
+
+        # Debounce: an accepted edge locks the button for a while, and
+        # a change while locked is taken once the lock ends.
+        for i in bits(self.locked):
+            if now - self.changed[i] >= self.debounce:
+                self.locked &= ~(1 << i)
+        change  = (sample ^ self.state) & ~self.locked
+        down    = change & sample
+        up      = change & ~sample
+        self.state  ^= change
+        self.locked |= change
+        for i in bits(change):
+            self.changed[i] = now
+        if down:
+            self.pressed(down, now, events)
+        if up:
+            events.append(Event(RELEASE, up, now))
+            self.released(up, now, events)
+
+        # Clicks nobody followed up in time
+        for i in bits(self.waiting & ~self.state):
+            if now - self.upTime[i] >= self.double:
+                self.waiting &= ~(1 << i)
+                events.append(Event(CLICK, 1 << i, now))
+
+        # Holds
+        for i in bits(self.state & ~self.consumed & ~self.longHeld):
+            down = now - self.downTime[i]
+            if down >= self.hold and not self.held & (1 << i):
+                self.held |= 1 << i
+                events.append(Event(HOLD, 1 << i, now))
+            if down >= self.longHold:
+                self.longHeld |= 1 << i
+                events.append(Event(LONG_HOLD, 1 << i, now))
+        return events
+
+    def pressed(self, down, now, events):
+        for i in bits(down):
+            self.downTime[i] = now
+        self.held     &= ~down
+        self.longHeld &= ~down
+        # Second press of a double click?
+        self.second  |= down & self.waiting
+        self.waiting &= ~down
+        # A button joining others already down (or going down with
+        # them) makes a chord, and gives that instead of a PRESS.  Every
+        # button in it is used up: no clicks or holds from them.
+        if self.state & (self.state - 1):
+            events.append(Event(CHORD, self.state, now))
+            self.consumed |= self.state
+            self.second   &= ~self.state
+        else:
+            events.append(Event(PRESS, down, now))
+
+    def released(self, up, now, events):
+        done = up & ~self.consumed & ~self.held
+        for i in bits(done):
+            self.upTime[i] = now
+            if self.second & (1 << i):
+                events.append(Event(DOUBLE, 1 << i, now))
+            elif self.doubles & (1 << i):
+                self.waiting |= 1 << i
             else:
-                this.DConUp = False
-            this.DCwaiting = False
-        # Button released
-        else if (this.buttonVal and not this.buttonLast and
-                (millis() - this.downTime) > debounce):
-            if not this.ignoreUp:
-                this.upTime = millis()
-                if not this.DConUp:
-                    this.DCwaiting = True
-                else:
-                    event = PRESS_DCLICK
-                    this.DConUp = False
-                    this.DCwaiting = False
-                    this.singleOK = False
-
-        # Test for normal click event: DCgap expired
-        if this.buttonVal and ((millis()-this.upTime) >= DCgap)
-        and this.DCwaiting and not this.DConUp and this.singleOK:
-            event = PRESS_CLICK
-            this.DCwaiting = False
-
-        # Test for hold
-        if (not this.buttonVal and (millis() - this.downTime) >= holdTime):
-            # Trigger "normal" hold
-            if not this.holdEventPast:
-                event = PRESS_LONG
-                this.waitForUp = True
-                this.ignoreUp = True
-                this.DConUp = False
-                this.DCwaiting = False
-                # this.downTime = millis();
-                this.holdEventPast = true
-
-            # Trigger "long" hold
-            if ((millis() - this.downTime) >= longHoldTime):
-                if (not this.longHoldEventPast):
-                    event = PRESS_HOLD
-                    this.longHoldEventPast = true
-
-        this.buttonLast = this.buttonVal
-        return (this.buttonType, event)
+                events.append(Event(CLICK, 1 << i, now))
+        self.second   &= ~up
+        self.consumed &= ~up
+
+    def deadline(self):
+        """ Time the next click or hold is due with no further samples,
+            or None if no timer is running """
+        times = [self.changed[i] + self.debounce for i in bits(self.locked)]
+        times += [self.upTime[i] + self.double
+                  for i in bits(self.waiting & ~self.state)]
+        for i in bits(self.state & ~self.consumed & ~self.longHeld):
+            times.append(self.downTime[i] +
+                         (self.longHold if self.held & (1 << i)
+                          else self.hold))
+        return min(times) if times else None
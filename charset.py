@@ -0,0 +1,90 @@
+# charset.py
+#
+# Maps Unicode text onto the character ROM of the HD44780 (the common
+# A00 variant), so station names and stream titles with accents or
+# symbols come out readable instead of as random katakana.
+#
+# Characters the ROM has a glyph for are mapped to that code.  Accented
+# letters without one are reduced to their base letter, a few common
+# typographic characters get ASCII stand-ins, and anything else becomes
+# '?'.  Private use characters pass through untouched, as those are the
+# plate's custom glyph placeholders (see Adafruit_CharLCDPlate.glyph()).
+#
+# The result is only meant for the LCD: ROM codes above 0x7F don't mean
+# the same thing in Unicode, so don't feed it through lcdText() again.
+import unicodedata
+from functools import lru_cache
+
+# Codes of the A00 ROM glyphs that have a Unicode counterpart
+ROM = { '°' : 0xDF,  # degree sign
+        'ä' : 0xE1,  # a umlaut
+        'ö' : 0xEF,  # o umlaut
+        'ü' : 0xF5,  # u umlaut
+        'ñ' : 0xEE,  # n tilde
+        'µ' : 0xE4,  # micro sign
+        'μ' : 0xE4,  # greek mu
+        '¥' : 0x5C,  # yen sign
+        'ß' : 0xE2,  # sharp s
+        'β' : 0xE2,  # greek beta
+        'α' : 0xE0,  # greek alpha
+        'ε' : 0xE3,  # greek epsilon
+        'σ' : 0xE5,  # greek sigma
+        'ρ' : 0xE6,  # greek rho
+        '√' : 0xE8,  # square root
+        '¢' : 0xEC,  # cent sign
+        'θ' : 0xF2,  # greek theta
+        '∞' : 0xF3,  # infinity
+        'Ω' : 0xF4,  # greek omega
+        'Σ' : 0xF6,  # greek capital sigma
+        'π' : 0xF7,  # greek pi
+        '÷' : 0xFD,  # division sign
+        '→' : 0x7E,  # right arrow
+        '←' : 0x7F,  # left arrow
+        '·' : 0xA5,  # middle dot
+        '•' : 0xA5 } # bullet
+
+# ASCII stand-ins for characters with no glyph of their own.  The ROM
+# has the yen sign and right arrow in place of backslash and tilde.
+SUBSTITUTES = { '\\' : '/', '~' : '-',
+                '‘' : "'", '’' : "'", '‚' : "'",
+                '“' : '"', '”' : '"', '„' : '"',
+                '–' : '-', '—' : '-', '−' : '-',
+                '«' : '<<', '»' : '>>',
+                '×' : 'x' }
+
+
+# str.translate() table that works out and remembers the mapping of each
+# character the first time it is seen.  ASCII is filled in up front.
+class Table(dict):
+    def __init__(self):
+        dict.__init__(self, ((c, c) for c in range(0x80)))
+        for c in ('\\', '~'):
+            self[ord(c)] = SUBSTITUTES[c]
+
+    def __missing__(self, code):
+        c = chr(code)
+        if c in ROM:
+            value = ROM[c]
+        elif c in SUBSTITUTES:
+            value = SUBSTITUTES[c]
+        elif 0xE000 <= code <= 0xF8FF:
+            value = code
+        else:
+            base  = ''.join(d for d in unicodedata.normalize('NFKD', c)
+                            if not unicodedata.combining(d))
+            value = '?'
+            if base and max(base) < '\x80':
+                value = base.translate(self)
+            elif len(base) == 1 and base in ROM:
+                value = ROM[base]
+        self[code] = value
+        return value
+
+
+TABLE = Table()
+
+
+@lru_cache(maxsize=256)
+def lcdText(text):
+    """ Return text with every character replaced by its LCD ROM code """
+    return text.translate(TABLE)
@@ -18,46 +18,89 @@
 #     http://www.instructables.com/id/Raspberry-Pi-Internet-Radio-With-Flask/?ALLSTEPS
 
 # dependancies
-from Adafruit_I2C          import Adafruit_I2C
-from Adafruit_MCP230xx     import Adafruit_MCP230XX
+# Only what the module itself needs at import time is imported here;
+# the hardware, worker threads, player and menu (and the modules behind
+# them) come in through APP when first used, so importing radiopi for a
+# tool or a test is cheap and touches no hardware.
 from Adafruit_CharLCDPlate import Adafruit_CharLCDPlate
+from buttons               import PRESS, CLICK, HOLD, CHORD
 from datetime              import datetime
-from subprocess            import *
+from functools             import cached_property
 from time                  import sleep, strftime, localtime
-from queue                 import Queue
-from threading             import Thread
-from configparser          import ConfigParser
-#from string                import split
-from xml.dom.minidom       import *
-# from ListSelector          import ListSelector
-
-import subprocess
-import smbus
-import time
 
-# initialize the LCD plate
-#   use busnum = 0 for raspi version 1 (256MB)
-#   and busnum = 1 for raspi version 2 (512MB)
-LCD = Adafruit_CharLCDPlate(busnum=1)
+import time
 
-# Define a queue to communicate with worker thread
-LCD_QUEUE = Queue()
-cfgParser = ConfigParser()
+# All display output goes through the compositor's worker thread
+LCD_FPS = 10
+
+# The LCD's contents are kept here, so a restart of the program can put
+# them straight back instead of clearing the display (see
+# Adafruit_CharLCDPlate); /run is a tmpfs, cleared on boot along with
+# the plate itself.
+LCD_STATE = '/run/radiopi.lcd'
+
+# After IDLE_TIMEOUT seconds without input the backlight goes off and
+# the screen isn't redrawn until the next button press (which only wakes
+# it up); loops with a clock tick every IDLE_TICK seconds meanwhile.
+IDLE_TIMEOUT = 300
+IDLE_TICK = 5.0
+
+# The input service polls the buttons on its own thread (every 10 ms
+# while they are in use, every INPUT_IDLE seconds otherwise)
+INPUT_IDLE = 0.2
+
+# Keypads, rotary encoders and IR remotes (see inputInit())
+EVDEV_DEVICES = ''   # /dev/input/event* paths, space separated
+LIRCD_SOCKET  = ''   # lircd socket path, e.g. /var/run/lirc/lircd
+
+# Volume changes go to the player from the mixer's worker thread, at
+# most MIXER_RATE writes a second however fast the volume is ramped
+MIXER_RATE = 5
+
+# LEFT/RIGHT show the next station's label straight away, but it is only
+# played once no other station has been picked for ZAP_WINDOW seconds,
+# so zapping through several stations connects to the last one only
+ZAP_WINDOW = 0.3
+
+# Muting fades the volume out (and unmuting back in) over MUTE_FADE
+# seconds, with the stream still playing.  Resuming after a pause of
+# GO_LIVE seconds or more rejoins the live broadcast with a fresh
+# connection, instead of carrying on from where it was paused (0: always
+# go live, negative: never).
+MUTE_FADE = 0.05
+GO_LIVE   = 30.0
+
+# The player, MPD, is driven over one connection kept open (see
+# MPDClient.py).  None: MPD_HOST/MPD_PORT from the environment, or
+# localhost:6600.  A host starting with '/' is MPD's UNIX socket.
+MPD_HOST = None
+MPD_PORT = None
+
+# Shell script that adds the stations to MPD's playlist ('mpc add URL'),
+# each after a '#' comment with its display label; read for both.
+PLAYLIST_FILE = '/home/pi/radiopi/radio_playlist.sh'
 
 # Globals
 INI_FILE       = 'radiopi.ini'
 PLAYLIST_MSG   = []
+PLAYLIST_URLS  = []
 STATION        = 1
 NUM_STATIONS   = 0
 VOL_MIN        = 0
 VOL_MAX        = 100
 VOL_DEFAULT    = 70
-LCD_COLOR      = LCD.VIOLET
+LCD_COLOR      = Adafruit_CharLCDPlate.VIOLET
 volCur         = VOL_MIN      # Current volume
 volNew         = VOL_DEFAULT  # 'Next' volume after interactions
 volSpeed       = 1.0          # Speed of volume change (accelerates w/hold)
+VOL_STEP       = 2            # Volume change for a click of UP/DOWN
+VOL_RAMP_DELAY = 0.4          # Seconds UP/DOWN is held before ramping
+VOL_RAMP_SPEED = 10.0         # Volume units/second when ramping starts
+VOL_RAMP_MAX   = 60.0         # ...accelerating to this at most
+VOL_ACCEL      = 1.15         # Speed multiplier per tick while held
 volSet         = False        # True if currently setting volume
 paused         = False        # True if music is paused
+pausedAt       = 0.0          # When it was paused
 BARWIDTH       = 7.0          # Vol Bar width on display
 VOLSPAN        = VOL_MAX - VOL_MIN + 1
 vPerSolidBar   = VOLSPAN / BARWIDTH
@@ -68,6 +111,7 @@ menufile = 'radiopi.xml'
 DEBUG = 0
 DISPLAY_ROWS = 2
 DISPLAY_COLS = 16
+TICK = 0.1  # Seconds between updates of screens with a clock
 
 # set zip chosen
 zipchosen = 20723
@@ -110,93 +154,199 @@ charSevenBitmaps = [[0b10000,  # Play (also selected station)
                      0b00000,
                      0b00000]]
 
-
-# ----------------------------
-# WORKER THREAD
-# ----------------------------
-
-# Define a function to run in the worker thread
-def update_lcd(q):
-    while True:
-        msg = q.get()
-        # if we're falling behind, skip some LCD updates
-        while not q.empty():
-            q.task_done()
-            msg = q.get()
-        LCD.setCursor(0, 0)
-        LCD.message(msg)
-        q.task_done()
-    return
+# Custom glyphs.  These are placeholder characters for use in LCD text;
+# the plate loads each into a CGRAM slot the first time it is shown.
+# Volume bargraph bricks, 0 to 5 vertical lines filled:
+VOL_BRICKS = [Adafruit_CharLCDPlate.glyph([(255 << (5 - i)) & 0x1f] * 8)
+              for i in range(6)]
+# Up/down icon
+UP_DOWN_ICON = Adafruit_CharLCDPlate.glyph([0b00100,
+                                            0b01110,
+                                            0b11111,
+                                            0b00000,
+                                            0b00000,
+                                            0b11111,
+                                            0b01110,
+                                            0b00100])
+# Play, pause and next track icons
+charSeven = [Adafruit_CharLCDPlate.glyph(b) for b in charSevenBitmaps]
+
+
+class App:
+    """ The radio's hardware, worker threads, settings, playlist and
+        menu, each made when first used """
+
+    def __init__(self, busnum=1, bus=None):
+        # use busnum = 0 for raspi version 1 (256MB)
+        # and busnum = 1 for raspi version 2 (512MB)
+        # bus: see Adafruit_I2C, e.g. 'emulator' to run without a plate
+        self.busnum = busnum
+        self.bus    = bus
+
+    @cached_property
+    def lcd(self):
+        # timed=True waits out clear/home instead of polling the busy flag
+        # latch=True has the port expander catch presses between polls
+        return Adafruit_CharLCDPlate(busnum=self.busnum, timed=True,
+                                     latch=True, bus=self.bus,
+                                     state=LCD_STATE)
+
+    @cached_property
+    def screen(self):
+        from Compositor import Compositor
+        return Compositor(self.lcd, fps=LCD_FPS, idle=IDLE_TIMEOUT)
+
+    @cached_property
+    def gestures(self):
+        # Turns button samples into presses, clicks, holds and chords
+        return newGestures()
+
+    @cached_property
+    def input(self):
+        from InputService import InputService
+        return InputService(self.lcd, self.gestures, slow=INPUT_IDLE,
+                            asleep=lambda: self.screen.asleep)
+
+    @cached_property
+    def mux(self):
+        # Other input devices put their events on the same queue
+        from InputSources import InputMux
+        return InputMux(self.input.queue)
+
+    @cached_property
+    def mixer(self):
+        # First used by radioInit, once the player has volCur
+        from Mixer import Mixer
+        return Mixer(lambda volume: self.mpd.setvol(volume),
+                     rate=MIXER_RATE, volume=volCur)
+
+    @cached_property
+    def tuner(self):
+        # Plays stations, debounced: see ZAP_WINDOW.  First used by
+        # radioInit, once the player has STATION playing.
+        from Debouncer import Debouncer
+        return Debouncer(lambda station: self.mpd.play(station - 1),
+                         rate=MIXER_RATE, quiet=ZAP_WINDOW, value=STATION)
+
+    @cached_property
+    def mpd(self):
+        # Connects on first use
+        from MPDClient import MPDClient
+        return MPDClient(MPD_HOST, MPD_PORT)
+
+    @cached_property
+    def player(self):
+        # What MPD is doing, kept current over a second connection
+        from MPDClient import MPDClient, Watcher
+        return Watcher(MPDClient(MPD_HOST, MPD_PORT))
+
+    @cached_property
+    def config(self):
+        from configparser import ConfigParser
+        return ConfigParser()
+
+    @cached_property
+    def playlist(self):
+        loadPlaylist()
+        return PLAYLIST_MSG
+
+    @cached_property
+    def menu(self):
+        from xml.dom import minidom
+        uiItems = Folder('root', '')
+        # parse an XML file by name
+        dom = minidom.parse(menufile)
+        top = dom.documentElement
+        ProcessNode(top, uiItems)
+        return uiItems
+
+
+APP = App()
 
 
 def settingsLoad():
-    global STATION, volCur, NUM_STATIONS, PLAYLIST_MSG, cfgParser, INI_FILE
-    global LCD_COLOR
+    global STATION, volCur, NUM_STATIONS, PLAYLIST_MSG, INI_FILE
+    global LCD_COLOR, EVDEV_DEVICES, LIRCD_SOCKET, IDLE_TIMEOUT
+    global MPD_HOST, MPD_PORT, ZAP_WINDOW, GO_LIVE
     # Read INI file
     if DEBUG:
         print('loading saved settings')
-    cfgParser.read(INI_FILE)
-    volCur = cfgParser.getint('settings_section', 'volume')
-    STATION = cfgParser.getint('settings_section', 'station')
-    LCD_COLOR = cfgParser.getint('settings_section', 'lcdcolor')
+    APP.config.read(INI_FILE)
+    volCur = APP.config.getint('settings_section', 'volume')
+    STATION = APP.config.getint('settings_section', 'station')
+    LCD_COLOR = APP.config.getint('settings_section', 'lcdcolor')
+    EVDEV_DEVICES = APP.config.get('input_section', 'evdev',
+                                  fallback=EVDEV_DEVICES)
+    LIRCD_SOCKET = APP.config.get('input_section', 'lircd',
+                                 fallback=LIRCD_SOCKET)
+    MPD_HOST = APP.config.get('mpd_section', 'host', fallback=MPD_HOST)
+    MPD_PORT = APP.config.get('mpd_section', 'port', fallback=MPD_PORT)
+    ZAP_WINDOW = APP.config.getfloat('settings_section', 'zap',
+                                     fallback=ZAP_WINDOW)
+    GO_LIVE = APP.config.getfloat('settings_section', 'golive',
+                                  fallback=GO_LIVE)
+    # 0 keeps the backlight on
+    IDLE_TIMEOUT = APP.config.getint('settings_section', 'idle',
+                                     fallback=IDLE_TIMEOUT) or None
 
 
 def lcdInit():
     # Setup AdaFruit LCD Plate
     global LCD_COLOR
-    LCD.begin(DISPLAY_COLS, DISPLAY_ROWS)
-    LCD.clear()
-    LCD.backlight(LCD_COLOR)
-
-    # Create volume bargraph custom characters (chars 0-5):
-    for i in range(6):
-        bitmap = []
-        bits = (255 << (5 - i)) & 0x1f
-        for j in range(8):
-            bitmap.append(bits)
-        LCD.createChar(i, bitmap)
-
-    # Create up/down icon (char 6)
-    LCD.createChar(6, [0b00100,
-                   0b01110,
-                   0b11111,
-                   0b00000,
-                   0b00000,
-                   0b11111,
-                   0b01110,
-                   0b00100])
-
-    # By default, char 7 is loaded in 'pause' state
-    LCD.createChar(7, charSevenBitmaps[1])
+    # Clears the display, unless it still shows the last run's frame
+    APP.lcd.begin(DISPLAY_COLS, DISPLAY_ROWS)
+    APP.lcd.backlight(LCD_COLOR)
+    # Only send the cells that changed; the clock and the padded
+    # playlist labels mostly rewrite what is already on screen.
+    APP.lcd.framebuffer()
+    # Custom characters (VOL_BRICKS etc.) are uploaded on first use
+
+    # From here on the LCD is only driven from the compositor's thread,
+    # and the buttons only read from the input service's
+    APP.screen.start()
+    APP.input.start()
+
+
+# Add the input devices named in the settings to APP.mux.  A device that
+# can't be opened is reported and left out.
+def inputInit():
+    from InputSources import EvdevSource, LircSource
+    for path in EVDEV_DEVICES.split():
+        try:
+            APP.mux.add(EvdevSource(path, gestures=newGestures()))
+        except OSError as err:
+            print('Input device %s: %s' % (path, err))
+    if LIRCD_SOCKET:
+        try:
+            APP.mux.add(LircSource(LIRCD_SOCKET))
+        except OSError as err:
+            print('lircd socket %s: %s' % (LIRCD_SOCKET, err))
+    if APP.mux.sources:
+        APP.mux.start()
 
 
 def radioInit():
-    global STATION, volCur, NUM_STATIONS, PLAYLIST_MSG, cfgParser, INI_FILE
-
-    # Stop music player
-    output = run_cmd("mpc stop")
-
-    # Create the worker thread and make it a daemon
-    worker = Thread(target=update_lcd, args=(LCD_QUEUE,))
-    worker.setDaemon(True)
-    worker.start()
+    global STATION, volCur, NUM_STATIONS, PLAYLIST_MSG, INI_FILE
 
     # Display startup banner
-    LCD_QUEUE.put('Welcome to\nRadio Pi', True)
+    APP.screen.show('Welcome to\nRadio Pi')
 
     # Load our station playlist
-    loadPlaylist()
-    sleep(2)
-    LCD.clear()
+    APP.playlist
     if(STATION > NUM_STATIONS):
         STATION = 1
 
-    # Start music player
-    LCD_QUEUE.put(PLAYLIST_MSG[STATION - 1], True)
-    mpc_play(STATION)
-    run_cmd("mpc volume " + str(volCur))
-    run_cmd("mpc volume +2")
-    run_cmd("mpc volume -2")
+    # Stop the music player, load the playlist into it and start our
+    # station, as one command list in one round trip.  Play starts at
+    # full volume, so the volume is set after it.
+    player('commandList', [('stop',)] + playlistCommands() +
+                          [('play', STATION - 1), ('setvol', volCur)])
+    APP.player.start()
+    sleep(2)
+
+    APP.screen.show(stationScreen())
+    APP.mixer.start()
+    APP.tuner.start()
 
     return
 
@@ -208,7 +358,7 @@ def chanUp():
         STATION = 1
     if DEBUG:
         print('playing Station ' + repr(STATION))
-    mpc_play(STATION)
+    APP.tuner.set(STATION)
     return True
 
 
@@ -219,47 +369,60 @@ def chanDown():
         STATION = NUM_STATIONS
     if DEBUG:
         print('playing Station ' + repr(STATION))
-    mpc_play(STATION)
+    APP.tuner.set(STATION)
     return True
 
 
 def volUp(amt):
-    global volCur
-    if(volCur <= (100-amt)):
-        output = run_cmd("mpc volume +"+str(amt))
-        volCur += amt
-        if DEBUG:
-            print('Setting Volume ' + repr(volCur))
-        return True
-    return False
+    return volTo(volCur + amt)
 
 
 def volDown(amt):
+    return volTo(volCur - amt)
+
+
+# Set the volume (clamped to VOL_MIN..VOL_MAX).  Returns immediately;
+# the mixer sends it to the player.  False if the volume didn't change.
+def volTo(volume):
     global volCur
-    if(volCur >= amt):
-        output = run_cmd("mpc volume -"+str(amt))
-        volCur -= amt
-        if DEBUG:
-            print('Setting Volume ' + repr(volCur))
-        return True
-    return False
+    volume = int(round(min(max(volume, VOL_MIN), VOL_MAX)))
+    if volume == volCur:
+        return False
+    volCur = volume
+    APP.mixer.set(volCur)
+    if DEBUG:
+        print('Setting Volume ' + repr(volCur))
+    return True
 
 
 def radioPlay():
-    global volSpeed, volSet, volCur, STATION, NUM_STATIONS
-    global PLAYLIST_MSG, cfgParser, INI_FILE
+    global volSpeed, volSet, volCur, volNew, STATION, NUM_STATIONS
+    global PLAYLIST_MSG, INI_FILE, paused
 
-    LCD_QUEUE.put(PLAYLIST_MSG[STATION - 1], True)
+    APP.screen.show(stationScreen())
+    stationView = True
+    seen = APP.player.changes
     countdown_to_play = 0
+    volRamp = NONE  # UP or DOWN while it is held down
+    volLast = 0     # When the volume last moved
+    lastTick = time.monotonic()
     showTime = False
     timeSinceLastDisplayChange = 0
 
     if DEBUG:
         print('inside radioPlay - flushing')
     flush_buttons()
-    # Main loop
+    # Main loop: runs on each button press, and at least every TICK
+    # seconds for the clock and the volume ramp
     while True:
-        press = read_buttons()
+        event = read_event(tick(), (PRESS, CLICK, HOLD, CHORD))
+        press = event.buttons if event else NONE
+        held  = event is not None and event.kind == HOLD
+        # The arrows act on their click or hold, not as they go down, so
+        # one that goes on to make a chord (UP_AND_DOWN, LEFT_AND_RIGHT)
+        # doesn't act on its own first.  SELECT goes as soon as it's down.
+        if event and (event.kind == PRESS) != (press == SELECT):
+            press = NONE
 
         # SELECT button pressed
         if(press == SELECT):
@@ -268,24 +431,62 @@ def radioPlay():
         # LEFT button pressed
         if(press == LEFT):
             chanDown()
-            LCD_QUEUE.put(PLAYLIST_MSG[STATION - 1], True)
+            APP.screen.show(stationScreen())
+            stationView = True
             showTime = False
             timeSinceLastDisplayChange = 0
 
         # RIGHT button pressed
         if(press == RIGHT):
             chanUp()
-            LCD_QUEUE.put(PLAYLIST_MSG[STATION - 1], True)
+            APP.screen.show(stationScreen())
+            stationView = True
             showTime = False
             timeSinceLastDisplayChange = 0
 
-        # UP button pressed
-        if(press == UP):
-            volSet = volUp(2)
+        # LEFT and RIGHT together: network info, SELECT returns here
+        if(press == LEFT_AND_RIGHT):
+            display_ipaddr()
+            APP.screen.show(stationScreen())
+            stationView = True
+            showTime = False
+            timeSinceLastDisplayChange = 0
 
-        # DOWN button pressed
-        if(press == DOWN):
-            volSet = volDown(2)
+        # UP and DOWN together: pause or resume
+        if(press == UP_AND_DOWN):
+            togglePause()
+            APP.screen.show(PLAYLIST_MSG[STATION - 1].split()[0] +
+                        ("\nPaused" if paused else ""))
+            stationView = False
+            showTime = False
+            timeSinceLastDisplayChange = 0
+
+        # UP or DOWN clicked: one step.  Held down (for VOL_RAMP_DELAY,
+        # see newGestures()), one step and then ramp the volume, faster
+        # and faster, until it's released (or another button joins it).
+        # The player only gets the latest volume now and then, and the
+        # final one on release.
+        if(press == UP or press == DOWN):
+            APP.mixer.mute(False, MUTE_FADE)
+            volSet = volUp(VOL_STEP) if press == UP else volDown(VOL_STEP)
+            if held:
+                volRamp  = press
+                volNew   = float(volCur)
+                volSpeed = VOL_RAMP_SPEED
+                volLast  = time.monotonic()
+        elif volRamp:
+            now = time.monotonic()
+            if APP.input.held() | APP.mux.held() != volRamp:
+                volRamp = NONE
+                APP.mixer.settle()
+            else:
+                step     = volSpeed * (now - volLast)
+                volNew   = min(max(volNew + (step if volRamp == UP
+                                             else -step),
+                                   VOL_MIN), VOL_MAX)
+                volSpeed = min(volSpeed * VOL_ACCEL, VOL_RAMP_MAX)
+                volSet   = volTo(volNew) or volSet
+            volLast = now
 
         # UP/DOWN volume change show bar on LCD
         if volSet is True:
@@ -294,66 +495,134 @@ def radioPlay():
             nSolid = int((volCur - VOL_MIN) / vPerSolidBar)
             fracV = (volCur - VOL_MIN) % vPerSolidBar
             nVertLines = int(round(fracV / vPerLine))
-            s = (chr(6) + ' Volume ' +  # ^ Volume string
-                 chr(5) * nSolid +  # Solid brick(s)
-                 chr(nVertLines) +  # Fractional brick
-                 chr(0) * (6 - nSolid))  # Spaces
+            s = (UP_DOWN_ICON + ' Volume ' +  # ^ Volume string
+                 VOL_BRICKS[5] * nSolid +  # Solid brick(s)
+                 VOL_BRICKS[nVertLines] +  # Fractional brick
+                 VOL_BRICKS[0] * (6 - nSolid))  # Spaces
             if DEBUG:
                 # print('vPerSolidBar = ' + str (vPerSolidBar) + '\n')
                 # print('vPerLine = ' + str (vPerLine) + '\n')
                 print('volCur = ' + str(volCur))
                 print('nSolid = ' + str(nSolid))
                 print('nVertLines = ' + str(nVertLines))
-            LCD_QUEUE.put(PLAYLIST_MSG[STATION - 1].split()[0] +
-                          "\n" + s, True)
-            volSpeed = 1.0
+            APP.screen.show(PLAYLIST_MSG[STATION - 1].split()[0] +
+                        "\n" + s)
+            stationView = False
             volSet = False
-        # Volume-setting mode now active (or was already there);
-        # act on button press.
-        if press == UP:
-            volNew = volCur + volSpeed
-            if volNew > VOL_MAX:
-                volNew = VOL_MAX
-        else:
-            volNew = volCur - volSpeed
-            if volNew < VOL_MIN:
-                volNew = VOL_MIN
-        # volTime   = time.time() # Time of last volume button press
-        # volSpeed *= 1.15        # Accelerate volume change
-        #     elif volSet:
-        #         volSpeed = 1.0 # Buttons released = reset volume speed
-        #         # If no interaction in 4 seconds, return to prior state.
-        #         # Volume bar will be erased by subsequent operations.
-        #         if (time.time() - volTime) >= 4:
-        #             volSet = False
-        #             if paused: drawPaused()
-
-        delay_milliseconds(99)
-        timeSinceLastDisplayChange += 99
+
+        now = time.monotonic()
+        timeSinceLastDisplayChange += int((now - lastTick) * 1000)
+        lastTick = now
+        # News from the player shows at once on the station screen and
+        # the clock
+        news = APP.player.changes != seen
+        seen = APP.player.changes
         if (showTime):
-            if (timeSinceLastDisplayChange > 900):
+            if (timeSinceLastDisplayChange > 900 or news):
                 timeSinceLastDisplayChange = 0
-                now = datetime.now()
-                LCD_QUEUE.put(PLAYLIST_MSG[STATION - 1].split()[0] + "\n" +
-                              now.strftime('%b %d  %H:%M:%S'), True)
+                APP.screen.show(stationScreen(clock=True))
         else:
+            if news and stationView:
+                APP.screen.show(stationScreen())
             if (timeSinceLastDisplayChange > 5000):
                 timeSinceLastDisplayChange = 0
                 showTime = True
 
 
+# What the player has to say, for the second line of the station screen:
+# an error, muted, 'Tuning...' until the stream's audio comes through,
+# paused or stopped, or the stream's title.  None if there's nothing to say.
+def playerLine():
+    player = APP.player
+    # Nothing to say yet about a station still being zapped to
+    if player.state and player.song != STATION - 1:
+        return None
+    if player.error:
+        return 'Error: ' + player.error
+    if APP.mixer.muted:
+        return 'Muted'
+    if player.tuning():
+        return 'Tuning\u2026'
+    if player.state == 'pause':
+        return 'Paused'
+    if player.state == 'stop':
+        return 'Stopped'
+    return player.title
+
+
+# The station's label, with the second line replaced by playerLine(),
+# or failing that by the clock if asked.  A long title scrolls (see
+# Compositor).
+def stationScreen(clock=False):
+    label = PLAYLIST_MSG[STATION - 1]
+    line  = playerLine()
+    if line:
+        return label.split('\n')[0].rstrip() + '\n' + line
+    if clock:
+        return (label.split()[0] + '\n' +
+                datetime.now().strftime('%b %d  %H:%M:%S'))
+    return label
+
+
+# Drop presses not yet read, and ignore buttons held down right now
+# until they are released
 def flush_buttons():
-    while(LCD.buttons() != 0):
-        delay_milliseconds(1)
+    APP.input.flush()
 
 
-def read_buttons():
-    buttons = LCD.buttons()
-    # Debounce push buttons
-    if(buttons != 0):
-        while(LCD.buttons() != 0):
-            delay_milliseconds(1)
-    return buttons
+# Gestures for the plate and the keyboards: nothing uses double clicks,
+# so clicks come as soon as the button is released, and a button held
+# for VOL_RAMP_DELAY is a hold
+def newGestures():
+    from buttons import Gestures
+    return Gestures(doubles=0, hold=VOL_RAMP_DELAY)
+
+
+# Wait for input, at most timeout seconds (None: for as long as it
+# takes), and return the next event of one of the given kinds (see
+# buttons.py), or None if there was none.
+#
+# Input also keeps the display awake; a press that wakes it up is taken
+# for that alone, along with the rest of its gesture.
+def read_event(timeout=None, kinds=(PRESS, CHORD)):
+    end = None if timeout is None else time.monotonic() + timeout
+    while True:
+        wait  = None if end is None else max(end - time.monotonic(), 0)
+        event = APP.input.get(wait)
+        if event is None:
+            return None
+        if APP.screen.touch():
+            APP.input.flush()
+            continue
+        if event.kind in kinds:
+            return event
+
+
+# Wait for a button press, at most timeout seconds (None: for as long as
+# it takes), and return the button pressed (or two or more pressed
+# together, e.g. UP_AND_DOWN), or NONE if there was none.  Returns as soon
+# as the button goes down, without waiting for it to be released.
+def read_buttons(timeout=None):
+    event = read_event(timeout)
+    return event.buttons if event else NONE
+
+
+# Seconds to wait for input between clock updates: 'seconds' normally,
+# IDLE_TICK while the display is dozing and nobody would see them
+def tick(seconds=TICK):
+    return IDLE_TICK if APP.screen.asleep else seconds
+
+
+# Ask 'Are you sure?': True if SELECT is pressed, False for LEFT
+def confirm():
+    APP.screen.show('Are you sure?\nPress Sel for Y')
+    flush_buttons()
+    while True:
+        press = read_buttons()
+        if press == LEFT:
+            return False
+        if press == SELECT:
+            return True
 
 
 def delay_milliseconds(milliseconds):
@@ -367,47 +636,67 @@ def delay_milliseconds(milliseconds):
 # ----------------------------
 
 def saveSettings():
-    global STATION, volCur, NUM_STATIONS, PLAYLIST_MSG, cfgParser, INI_FILE
-    cfgParser.set('settings_section', 'volume', str(volCur))
-    cfgParser.set('settings_section', 'station', str(STATION))
-    cfgParser.set('settings_section', 'lcdcolor', str(LCD_COLOR))
+    global STATION, volCur, NUM_STATIONS, PLAYLIST_MSG, INI_FILE
+    APP.config.set('settings_section', 'volume', str(volCur))
+    APP.config.set('settings_section', 'station', str(STATION))
+    APP.config.set('settings_section', 'lcdcolor', str(LCD_COLOR))
     # Write our configuration file
     with open(INI_FILE, 'wb') as configfile:
-        cfgParser.write(configfile)
+        APP.config.write(configfile)
 
 
 def saveSettingsWrapper():
-    LCD_QUEUE.put("Saving          \nSettings ...    ", True)
+    APP.screen.show("Saving          \nSettings ...    ")
     saveSettings()
     sleep(1)
-    LCD_QUEUE.put("Settings        \nSaved ...       ", True)
+    APP.screen.show("Settings        \nSaved ...       ")
     sleep(2)
 
 
 def loadPlaylist():
-    global STATION, NUM_STATIONS, PLAYLIST_MSG
-
-    # Run shell script to add all stations
-    # to the MPC/MPD music player playlist
-    output = run_cmd("mpc clear")
-    output = run_cmd("/home/pi/radiopi/radio_playlist.sh")
-
-    # Load PLAYLIST_MSG list
-    PLAYLIST_MSG = []
-    with open("/home/pi/radiopi/radio_playlist.sh", "r") as playlist:
-        # Skip leading hash-bang line
+    global STATION, NUM_STATIONS, PLAYLIST_MSG, PLAYLIST_URLS
+
+    # Load PLAYLIST_MSG and PLAYLIST_URLS from the playlist script: a
+    # station is an 'mpc add URL' line, labelled by the comment before
+    # it (or its URL, if there is none)
+    PLAYLIST_MSG  = []
+    PLAYLIST_URLS = []
+    label = None
+    with open(PLAYLIST_FILE, "r") as playlist:
         for line in playlist:
-            if line[0:1] != '#!':
-                break
-        # Remaining comment lines are loaded
-        for line in playlist:
-            if line[0] == "#":
-                PLAYLIST_MSG.append(line.replace(r'\n',
-                                    '\n')[1:-1] + "                ")
-    playlist.close()
+            line   = line.rstrip('\n')
+            fields = line.split()
+            if line[0:2] == '#!':
+                continue
+            if line[0:1] == '#':
+                label = line[1:].replace(r'\n', '\n') + "                "
+            elif fields[0:2] == ['mpc', 'add'] and len(fields) == 3:
+                PLAYLIST_MSG.append(label or fields[2])
+                PLAYLIST_URLS.append(fields[2])
+                label = None
     NUM_STATIONS = len(PLAYLIST_MSG)
 
 
+# MPD commands that replace its playlist with our stations, to go out
+# in one command list with whatever else needs doing
+def playlistCommands():
+    return [('clear',)] + [('add', url) for url in PLAYLIST_URLS]
+
+
+# Menu action: read the playlist file again, rebuild MPD's playlist from
+# it and carry on playing the current station, in one command list
+def reloadPlaylist():
+    global STATION
+    APP.screen.show("Reloading       \nPlaylist ...    ")
+    loadPlaylist()
+    if(STATION > NUM_STATIONS):
+        STATION = 1
+    player('commandList', playlistCommands() + [('play', STATION - 1)])
+    APP.tuner.reset(STATION)    # Playing it now
+    APP.screen.show("Playlist        \nReloaded ...    ")
+    sleep(1)
+
+
 # ----------------------------
 # RADIO SETUP MENU
 # ----------------------------
@@ -438,158 +727,171 @@ def display_ipaddr():
     if ipaddr == "":
         ipaddr = run_cmd(show_wlan0)
 
-    LCD.backlight(LCD.VIOLET)
+    APP.screen.call(APP.lcd.backlight, APP.lcd.VIOLET)
     i = 29
-    muting = False
     keep_looping = True
+    nextTick = time.monotonic()
     while (keep_looping):
+        # Every 100 milliseconds, read the switches: act on a press
+        # straight away, but only count a tick when one is due.
+        press = read_buttons(tick(max(nextTick - time.monotonic(), 0)))
+        if time.monotonic() < nextTick:
+            ticked = False
+        else:
+            ticked = True
+            nextTick = max(nextTick + TICK, time.monotonic())
+            i += 1
+
         # Every 1/2 second, update the time display
-        i += 1
         # if(i % 10 == 0):
-        if(i % 5 == 0):
-            LCD_QUEUE.put(datetime.now().strftime('%b %d  %H:%M:%S\n') +
-                          ipaddr, True)
+        if(ticked and i % 5 == 0):
+            APP.screen.show(datetime.now().strftime('%b %d  %H:%M:%S\n') +
+                        ipaddr)
 
         # Every 3 seconds, update ethernet or wi-fi IP address
-        if(i == 60):
+        if(ticked and i == 60):
             ipaddr = run_cmd(show_eth0)
             i = 0
-        elif(i == 30):
+        elif(ticked and i == 30):
             ipaddr = run_cmd(show_wlan0)
 
-        # Every 100 milliseconds, read the switches
-        press = read_buttons()
         # Take action on switch press
 
         # UP button pressed
         if(press == UP):
-            output = run_cmd("mpc volume +2")
-            if(volCur < 99):
-                volCur += 2
+            volUp(VOL_STEP)
 
         # DOWN button pressed
         if(press == DOWN):
-            output = run_cmd("mpc volume -2")
-            if(volCur > 1):
-                volCur -= 2
+            volDown(VOL_STEP)
 
         # SELECT button = exit
         if(press == SELECT):
             keep_looping = False
 
-        # LEFT or RIGHT toggles mute
+        # LEFT or RIGHT toggles mute.  The stream keeps playing, so
+        # unmuting only has to fade the volume back in.
         elif(press == LEFT or press == RIGHT):
-            if muting:
-                # amixer command not working, can't use next line
-                # output = run_cmd("amixer -q cset numid=2 1")
-                mpc_play(STATION)
-                # work around a problem.  Play always starts at full volume
-                delay_milliseconds(400)
-                output = run_cmd("mpc volume +2")
-                output = run_cmd("mpc volume -2")
-            else:
-                # amixer command not working, can't use next line
-                # output = run_cmd("amixer -q cset numid=2 0")
-                output = run_cmd("mpc stop")
-            muting = not muting
-
-        delay_milliseconds(99)
+            APP.mixer.mute(not APP.mixer.muted, MUTE_FADE)
 
-    LCD.backlight(LCD_COLOR)
+    APP.screen.call(APP.lcd.backlight, LCD_COLOR)
 
 
 def run_cmd(cmd):
-    p = Popen(cmd, shell=True, stdout=PIPE, stderr=STDOUT)
+    from subprocess import Popen, PIPE, STDOUT
+    p = Popen(cmd, shell=True, stdout=PIPE, stderr=STDOUT, text=True)
     output = p.communicate()[0]
     return output
 
 
+# Pause the player, or resume it: where it was paused, or after a long
+# pause (see GO_LIVE), back at the live broadcast.  Which one goes by
+# the player's state as the watcher last saw it, so a station played
+# since (by zapping, say) counts as resumed.
+def togglePause():
+    global paused, pausedAt
+    state = APP.player.state
+    if state == 'pause':
+        if GO_LIVE >= 0 and time.monotonic() - pausedAt >= GO_LIVE:
+            mpc_play(STATION)
+        else:
+            player('pause', False)
+    elif state == 'stop':
+        mpc_play(STATION)
+    else:
+        player('pause')
+        pausedAt = time.monotonic()
+    paused = state not in ('pause', 'stop')
+
+
+# Run an MPD command (an MPDClient method).  If MPD is down or refuses
+# it, that is reported and the radio carries on without.
+def player(command, *args):
+    try:
+        return getattr(APP.mpd, command)(*args)
+    except IOError as err:
+        print('MPD %s: %s' % (command, err))
+        return None
+
+
 def mpc_play(STATION):
-    pid = Popen(["/usr/bin/mpc", "play", '%d' % (STATION)]).pid
+    # MPD counts playlist positions from 0
+    player('play', STATION - 1)
 
 
 # commands
 def DoQuit():
-    LCD.clear()
-    LCD.message('Are you sure?\nPress Sel for Y')
-    while 1:
-        if LCD.buttonPressed(LCD.LEFT):
-            break
-        if LCD.buttonPressed(LCD.SELECT):
-            LCD.clear()
-            LCD.backlight(LCD.OFF)
-            quit()
-        sleep(0.25)
+    if confirm():
+        APP.screen.show('')
+        APP.screen.call(APP.lcd.backlight, APP.lcd.OFF)
+        APP.screen.sync()
+        quit()
 
 
 def DoShutdown():
-    LCD.clear()
-    LCD.message('Are you sure?\nPress Sel for Y')
-    while 1:
-        if LCD.buttonPressed(LCD.LEFT):
-            break
-        if LCD.buttonPressed(LCD.SELECT):
-            LCD.clear()
-            LCD.backlight(LCD.OFF)
-            saveSettings()
-            subprocess.run(["sudo", "shutdown", "-h", "now"])
-            quit()
-        sleep(0.25)
+    if confirm():
+        APP.screen.show('')
+        APP.screen.call(APP.lcd.backlight, APP.lcd.OFF)
+        APP.screen.sync()
+        saveSettings()
+        import subprocess
+        subprocess.run(["sudo", "shutdown", "-h", "now"])
+        quit()
 
 
 def LcdOff():
-    LCD.backlight(LCD.OFF)
+    APP.screen.call(APP.lcd.backlight, APP.lcd.OFF)
 
 
 def LcdOn():
-    LCD.backlight(LCD.ON)
+    APP.screen.call(APP.lcd.backlight, APP.lcd.ON)
 
 
 def LcdRed():
     global LCD_COLOR
-    LCD_COLOR = LCD.RED
-    LCD.backlight(LCD_COLOR)
+    LCD_COLOR = APP.lcd.RED
+    APP.screen.call(APP.lcd.backlight, LCD_COLOR)
 
 
 def LcdGreen():
     global LCD_COLOR
-    LCD_COLOR = LCD.GREEN
-    LCD.backlight(LCD_COLOR)
+    LCD_COLOR = APP.lcd.GREEN
+    APP.screen.call(APP.lcd.backlight, LCD_COLOR)
 
 
 def LcdBlue():
     global LCD_COLOR
-    LCD_COLOR = LCD.BLUE
-    LCD.backlight(LCD_COLOR)
+    LCD_COLOR = APP.lcd.BLUE
+    APP.screen.call(APP.lcd.backlight, LCD_COLOR)
 
 
 def LcdYellow():
     global LCD_COLOR
-    LCD_COLOR = LCD.YELLOW
-    LCD.backlight(LCD_COLOR)
+    LCD_COLOR = APP.lcd.YELLOW
+    APP.screen.call(APP.lcd.backlight, LCD_COLOR)
 
 
 def LcdTeal():
     global LCD_COLOR
-    LCD_COLOR = LCD.TEAL
-    LCD.backlight(LCD_COLOR)
+    LCD_COLOR = APP.lcd.TEAL
+    APP.screen.call(APP.lcd.backlight, LCD_COLOR)
 
 
 def LcdViolet():
     global LCD_COLOR
-    LCD_COLOR = LCD.VIOLET
-    LCD.backlight(LCD_COLOR)
+    LCD_COLOR = APP.lcd.VIOLET
+    APP.screen.call(APP.lcd.backlight, LCD_COLOR)
 
 
 def ShowDateTime():
     if DEBUG:
         print('in ShowDateTime')
-    LCD.clear()
-    while not(LCD.buttons()):
-        sleep(0.25)
-        # LCD.home()
-        # LCD.message(strftime('%a %b %d %Y\n%I:%M:%S %p', localtime()))
-        LCD_QUEUE.put(strftime('%a %b %d %Y\n%I:%M:%S %p', localtime()))
+    APP.screen.show('')
+    flush_buttons()
+    while True:
+        APP.screen.show(strftime('%a %b %d %Y\n%I:%M:%S %p', localtime()))
+        if read_buttons(tick(0.25)):
+            break
 
 
 '''
@@ -603,14 +905,14 @@ def SetDateTime():
 def ShowIPAddress():
     if DEBUG:
         print('in ShowIPAddress')
-    LCD.clear()
+    APP.screen.show('')
     #######
     # RR TODO
-    # LCD.message(commands.getoutput("/sbin/ifconfig").
+    # APP.lcd.message(commands.getoutput("/sbin/ifconfig").
                 split("\n")[1].split()[1][5:])
     #######
     while 1:
-        if LCD.buttonPressed(LCD.LEFT):
+        if APP.lcd.buttonPressed(APP.lcd.LEFT):
             break
         sleep(0.25)
 '''
@@ -619,39 +921,23 @@ def ShowIPAddress():
 # only use the following if you find useful
 def Use10Network():
     "Allows you to switch to a different network for local connection"
-    LCD.clear()
-    LCD.message('Are you sure?\nPress Sel for Y')
-    while 1:
-        if LCD.buttonPressed(LCD.LEFT):
-            break
-        if LCD.buttonPressed(LCD.SELECT):
-            # uncomment the following once you have a separate network defined
-            # commands.getoutput("sudo cp /etc/network/interfaces.hub.10"
-            # "/etc/network/interfaces")
-            LCD.clear()
-            LCD.message('Please reboot')
-            sleep(1.5)
-            break
-        sleep(0.25)
+    if confirm():
+        # uncomment the following once you have a separate network defined
+        # commands.getoutput("sudo cp /etc/network/interfaces.hub.10"
+        # "/etc/network/interfaces")
+        APP.screen.show('Please reboot')
+        sleep(1.5)
 
 
 # only use the following if you find useful
 def UseDHCP():
     "Allows you to switch to a network config that uses DHCP"
-    LCD.clear()
-    LCD.message('Are you sure?\nPress Sel for Y')
-    while 1:
-        if LCD.buttonPressed(LCD.LEFT):
-            break
-        if LCD.buttonPressed(LCD.SELECT):
-            # uncomment the following once you get an original copy in place
-            # commands.getoutput("sudo"
-            # "cp /etc/network/interfaces.orig /etc/network/interfaces")
-            LCD.clear()
-            LCD.message('Please reboot')
-            sleep(1.5)
-            break
-        sleep(0.25)
+    if confirm():
+        # uncomment the following once you get an original copy in place
+        # commands.getoutput("sudo"
+        # "cp /etc/network/interfaces.orig /etc/network/interfaces")
+        APP.screen.show('Please reboot')
+        sleep(1.5)
 
 
 def ShowLatLon():
@@ -665,13 +951,11 @@ def SetLatLon():
 
 
 def ShowLocation():
-    global LCD
     global locchosen
     if DEBUG:
         print('in ShowLocation')
         print(locchosen[0], locchosen[1], locchosen[2])
-    LCD.clear()
-    LCD.message(locchosen[0])
+    APP.screen.show(locchosen[0])
     sleep(0.1)
     waitForButton()
 
@@ -679,33 +963,22 @@ def ShowLocation():
 def SetLocation():
     if DEBUG:
         print('in SetLocation')
-    global LCD
     global locchosen
     list = []
     # coordinates usable by ephem library, lat, lon, elevation (m)
     list.append(['Laurel, MD', '39.1333', '-76.8435', 92])
     list.append(['New York', '40.7143528', '-74.0059731', 9.775694])
     list.append(['Paris', '48.8566667', '2.3509871', 35.917042])
-    selector = ListSelector(list, LCD)
+    from ListSelector import ListSelector
+    selector = ListSelector(list, APP.screen, APP.input)
     item = selector.Pick()
     # do something useful
     locchosen = list[item]
 
 
 def waitForButton():
-        # Poll all buttons once,
-        # avoids repeated I2C traffic for different cases
-        while 1:
-                b        = LCD.buttons()
-                btnUp    = b & (1 << LCD.UP)
-                btnDown  = b & (1 <<LCD.DOWN)
-                btnLeft  = b & (1 <<LCD.LEFT)
-                btnRight = b & (1 <<LCD.RIGHT)
-                btnSel   = b & (1 <<LCD.SELECT)
-
-                if (btnUp or btnDown or btnLeft or btnRight or btnSel):
-                        break
-                sleep(0.1)
+        flush_buttons()
+        read_buttons()
 
 
 class CommandToRun:
@@ -719,31 +992,30 @@ class CommandToRun:
         #self.clist = split(commands.getoutput(self.commandToRun), '\n')
         clistlen = len(self.clist)
         if clistlen > 0:
-            LCD.clear()
             if clistlen > 1:
-                LCD.message(self.clist[0]+'\n'+self.clist[1])
+                APP.screen.show(self.clist[0]+'\n'+self.clist[1])
             else:
-                LCD.message(self.clist[0])
+                APP.screen.show(self.clist[0])
 
             j = 0
             btnPressed = 1
             while 1:
 
                 if btnPressed:
-                        LCD.clear()
                         if j < (clistlen-1):
-                                LCD.message(self.clist[j]+'\n'+self.clist[j+1])
+                                APP.screen.show(self.clist[j]+'\n'+
+                                                self.clist[j+1])
                         else:
-                                LCD.message(self.clist[j]+'\n')
+                                APP.screen.show(self.clist[j]+'\n')
                         sleep(0.25)
 
                 btnPressed = 0
-                b        = LCD.buttons()
-                btnUp    = b & (1 << LCD.UP)
-                btnDown  = b & (1 << LCD.DOWN)
-                btnLeft  = b & (1 << LCD.LEFT)
-                btnRight = b & (1 << LCD.RIGHT)
-                btnSel   = b & (1 << LCD.SELECT)
+                b        = read_buttons()
+                btnUp    = b & (1 << APP.lcd.UP)
+                btnDown  = b & (1 << APP.lcd.DOWN)
+                btnLeft  = b & (1 << APP.lcd.LEFT)
+                btnRight = b & (1 << APP.lcd.RIGHT)
+                btnSel   = b & (1 << APP.lcd.SELECT)
 
                 if btnDown:
                         btnPressed = 1
@@ -772,27 +1044,26 @@ class Folder:
 
 
 def HandleSettings(node):
-    global LCD
     if DEBUG:
         print('In HandleSettings')
     if node.getAttribute('lcdColor').lower() == 'red':
-        LCD.backlight(LCD.RED)
+        APP.screen.call(APP.lcd.backlight, APP.lcd.RED)
     elif node.getAttribute('lcdColor').lower() == 'green':
-        LCD.backlight(LCD.GREEN)
+        APP.screen.call(APP.lcd.backlight, APP.lcd.GREEN)
     elif node.getAttribute('lcdColor').lower() == 'blue':
-        LCD.backlight(LCD.BLUE)
+        APP.screen.call(APP.lcd.backlight, APP.lcd.BLUE)
     elif node.getAttribute('lcdColor').lower() == 'yellow':
-        LCD.backlight(LCD.YELLOW)
+        APP.screen.call(APP.lcd.backlight, APP.lcd.YELLOW)
     elif node.getAttribute('lcdColor').lower() == 'teal':
-        LCD.backlight(LCD.TEAL)
+        APP.screen.call(APP.lcd.backlight, APP.lcd.TEAL)
     elif node.getAttribute('lcdColor').lower() == 'violet':
-        LCD.backlight(LCD.VIOLET)
+        APP.screen.call(APP.lcd.backlight, APP.lcd.VIOLET)
     elif node.getAttribute('lcdColor').lower() == 'white':
-        LCD.backlight(LCD.ON)
+        APP.screen.call(APP.lcd.backlight, APP.lcd.ON)
     if node.getAttribute('lcdBacklight').lower() == 'on':
-        LCD.backlight(LCD.ON)
+        APP.screen.call(APP.lcd.backlight, APP.lcd.ON)
     elif node.getAttribute('lcdBacklight').lower() == 'off':
-        LCD.backlight(LCD.OFF)
+        APP.screen.call(APP.lcd.backlight, APP.lcd.OFF)
 
 
 def ProcessNode(currentNode, currentItem):
@@ -800,7 +1071,7 @@ def ProcessNode(currentNode, currentItem):
     children = currentNode.childNodes
 
     for child in children:
-        if isinstance(child, xml.dom.minidom.Element):
+        if child.nodeType == child.ELEMENT_NODE:
             if child.tagName == 'settings':
                 HandleSettings(child)
             elif child.tagName == 'folder':
@@ -816,7 +1087,7 @@ def ProcessNode(currentNode, currentItem):
                                            child.firstChild.data)
                 currentItem.items.append(thisCommand)
 
-    LCD.backlight(LCD_COLOR)
+    APP.screen.call(APP.lcd.backlight, LCD_COLOR)
 
 
 class Display:
@@ -855,7 +1126,7 @@ class Display:
                     str += cmd
         if DEBUG:
             print('------------------')
-        LCD_QUEUE.put(str, True)
+        APP.screen.show(str)
 
     def update(self, command):
         if DEBUG:
@@ -943,33 +1214,25 @@ class Display:
 # ----------------------------
 # start things up
 def main():
-    global STATION, volCur, NUM_STATIONS, PLAYLIST_MSG, cfgParser, INI_FILE
+    global STATION, volCur, NUM_STATIONS, PLAYLIST_MSG, INI_FILE
 
     if DEBUG:
         print('entering main()')
 
     settingsLoad()
     lcdInit()
+    inputInit()
     radioInit()
     radioPlay()
 
-    uiItems = Folder('root', '')
-
-    # parse an XML file by name
-    dom = parse(menufile)
-
-    top = dom.documentElement
-
-    ProcessNode(top, uiItems)
-
-    display = Display(uiItems)
+    display = Display(APP.menu)
     display.display()
 
     if DEBUG:
         print('entering while() in main()')
 
     while 1:
-        # Poll all buttons once, avoids repeated I2C traffic
+        # Sleeps until a button is pressed
         pressed = read_buttons()
 
         if (pressed == LEFT):
@@ -992,9 +1255,5 @@ def main():
             display.update('s')
             display.display()
 
-    sleep(0.15)
-
-    update_lcd.join()
-
 if __name__ == '__main__':
     main()
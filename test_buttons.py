@@ -0,0 +1,56 @@
+# test_buttons.py
+#
+# Gestures fed button samples at set times, as the input service would.
+from buttons import Gestures, PRESS, RELEASE, CLICK, DOUBLE, HOLD, CHORD
+
+UP, DOWN = 1 << 3, 1 << 2
+
+
+# Events from (time, sample) pairs, then timers up to 'end'
+def run(gestures, samples, end=None):
+    events = []
+    for now, sample in samples:
+        events += gestures.update(sample, now)
+    if end is not None:
+        events += gestures.update(None, end)
+    return events
+
+
+def test_click():
+    gestures = Gestures(doubles=0)
+    events   = run(gestures, [(0.0, UP), (0.1, 0)])
+    assert [(e.kind, e.buttons) for e in events] == \
+           [(PRESS, UP), (RELEASE, UP), (CLICK, UP)]
+
+
+def test_hold():
+    gestures = Gestures(doubles=0, hold=0.4)
+    events   = run(gestures, [(0.0, UP), (0.5, UP), (0.6, 0)])
+    assert [e.kind for e in events] == [PRESS, HOLD, RELEASE]
+
+
+def test_chord_together():
+    gestures = Gestures(doubles=0)
+    events   = run(gestures, [(0.0, UP | DOWN), (0.1, 0)], end=1.0)
+    assert [(e.kind, e.buttons) for e in events] == \
+           [(CHORD, UP | DOWN), (RELEASE, UP | DOWN)]
+
+
+def test_chord_one_after_another():
+    # UP, then DOWN joining it: DOWN gives no PRESS of its own, and
+    # neither gives a click or hold, so only the CHORD is acted on
+    gestures = Gestures(doubles=0, hold=0.4)
+    events   = run(gestures, [(0.0, UP), (0.1, UP | DOWN),
+                              (0.2, DOWN), (0.3, 0)], end=5.0)
+    assert [(e.kind, e.buttons) for e in events] == \
+           [(PRESS, UP), (CHORD, UP | DOWN), (RELEASE, UP), (RELEASE, DOWN)]
+    assert [e for e in events if e.kind not in (PRESS, RELEASE)] == \
+           [events[1]]
+
+
+def test_double():
+    gestures = Gestures()
+    events   = run(gestures, [(0.0, UP), (0.05, 0), (0.1, UP), (0.15, 0)],
+                   end=1.0)
+    assert [e.kind for e in events] == [PRESS, RELEASE, PRESS, RELEASE,
+                                        DOUBLE]
@@ -0,0 +1,31 @@
+# test_compositor.py
+#
+# The compositor's display thread driving a plate on an SMBusEmulator.
+from Adafruit_CharLCDPlate import Adafruit_CharLCDPlate
+from Compositor import Compositor
+from SMBusEmulator import SMBusEmulator
+
+
+def compositor():
+    bus    = SMBusEmulator(realtime=False)
+    screen = Compositor(Adafruit_CharLCDPlate(bus=bus), fps=100)
+    screen.start()
+    return bus, screen
+
+
+def test_show():
+    bus, screen = compositor()
+    screen.show('Hello\nWorld')
+    assert screen.sync(5.0)
+    bus.assertScreen('Hello', 'World')
+
+
+def test_survives_failing_op():
+    # An op that raises is reported; the thread goes on to the frames
+    # shown after it, and sync() doesn't wait on it forever
+    bus, screen = compositor()
+    screen.call(screen.lcd.setCursor, 'no', 'such')
+    assert screen.sync(5.0)
+    screen.show('Still here')
+    assert screen.sync(5.0)
+    bus.assertScreen('Still here')
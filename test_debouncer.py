@@ -0,0 +1,42 @@
+# test_debouncer.py
+#
+# Debouncer's worker thread against a stub send() that records what
+# would have been sent.
+from time import sleep
+
+from Debouncer import Debouncer
+
+
+def test_burst_sends_last_only():
+    # As radiopi's tuner: five stations picked in a burst, faster than
+    # the quiet time, start only the fifth
+    sent  = []
+    tuner = Debouncer(sent.append, rate=100, quiet=0.05, value=1)
+    tuner.start()
+    for station in range(2, 7):
+        tuner.set(station)
+        sleep(0.005)
+    sleep(0.3)
+    assert sent == [6]
+    assert tuner.writes == 1
+    assert tuner.dropped == 4
+
+
+def test_back_where_it_started():
+    # Zapping away and back again within the quiet time sends nothing
+    sent  = []
+    tuner = Debouncer(sent.append, rate=100, quiet=0.05, value=3)
+    tuner.start()
+    tuner.set(4)
+    tuner.set(3)
+    sleep(0.3)
+    assert sent == []
+
+
+def test_settle():
+    sent  = []
+    tuner = Debouncer(sent.append, rate=100, value=3)
+    tuner.start()
+    tuner.settle()
+    sleep(0.1)
+    assert sent == [3]
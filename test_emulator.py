@@ -0,0 +1,101 @@
+# test_emulator.py
+#
+# The LCD plate driver on an SMBusEmulator, with no /dev/i2c: what the
+# display shows, the backlight and the buttons, in emulated and real
+# time.
+import random
+
+import pytest
+
+from Adafruit_CharLCDPlate import Adafruit_CharLCDPlate
+from SMBusEmulator import SMBusEmulator
+
+
+def plate(bus, **kwargs):
+    # Default busnum: nothing may look for a Pi's bus number
+    return Adafruit_CharLCDPlate(bus=bus, **kwargs)
+
+
+def test_message():
+    bus = SMBusEmulator(realtime=False)
+    lcd = plate(bus)
+    lcd.message('Hello\nWorld')
+    bus.assertScreen('Hello', 'World')
+    bus.assertIdle()
+
+
+def test_clear():
+    bus = SMBusEmulator(realtime=False)
+    lcd = plate(bus)
+    lcd.message('Hello')
+    lcd.clear()
+    assert bus.screen() == [' ' * 16] * 2
+
+
+def test_backlight():
+    bus = SMBusEmulator(realtime=False)
+    lcd = plate(bus)
+    lcd.backlight(lcd.TEAL)
+    assert bus.backlight() == lcd.TEAL
+    lcd.backlight(lcd.RED)
+    assert bus.backlight() == lcd.RED
+
+
+def test_buttons():
+    bus = SMBusEmulator(realtime=False)
+    lcd = plate(bus)
+    assert lcd.buttons() == 0
+    bus.setButtons((1 << lcd.UP) | (1 << lcd.DOWN))
+    assert lcd.buttons() == (1 << lcd.UP) | (1 << lcd.DOWN)
+    assert lcd.buttonPressed(lcd.UP)
+    assert not lcd.buttonPressed(lcd.SELECT)
+
+
+def test_emulator_from_environment(monkeypatch):
+    monkeypatch.setenv('I2C_EMULATOR', '400k')
+    lcd = Adafruit_CharLCDPlate()
+    lcd.message('Hello')
+    assert lcd.i2c.arbiter.bus.speed == 400000
+
+
+def test_failed_transaction():
+    bus = SMBusEmulator(realtime=False)
+    lcd = plate(bus)
+    bus.failNext()
+    with pytest.raises(IOError):
+        lcd.buttons()
+    assert lcd.buttons() == 0
+
+
+# Random frames with clears and homes mixed in, as radiopi draws them
+def churn(lcd, frames=200):
+    rand = random.Random(1)
+    for i in range(frames):
+        r = rand.random()
+        if r < 0.1:
+            lcd.clear()
+        elif r < 0.15:
+            lcd.home()
+        lcd.setCursor(0, 0)
+        lcd.message(''.join(rand.choice('abc  xyz') for c in range(16)) +
+                    '\n' + 'q' * rand.randint(0, 16))
+
+
+def test_timed_mode_emulated_time():
+    # Timed mode waits out clears by the emulator's clock, so nothing is
+    # sent while the LCD is busy even when only bus time passes
+    bus = SMBusEmulator(realtime=False)
+    churn(plate(bus, timed=True))
+    bus.assertIdle()
+
+
+def test_timed_mode_real_time():
+    bus = SMBusEmulator(realtime=True)
+    churn(plate(bus, timed=True), 50)
+    bus.assertIdle()
+
+
+def test_polled_mode():
+    bus = SMBusEmulator(realtime=False)
+    churn(plate(bus))
+    bus.assertIdle()
@@ -0,0 +1,38 @@
+# test_framebuffer.py
+#
+# Framebuffer mode (Adafruit_CharLCDPlate.framebuffer()) against plain
+# message() on a second emulated plate given the same frames.
+import random
+
+from Adafruit_CharLCDPlate import Adafruit_CharLCDPlate
+from SMBusEmulator import SMBusEmulator
+
+
+def frames(count, seed=1):
+    rand = random.Random(seed)
+    for i in range(count):
+        text = ''.join(rand.choice('ab ') for c in range(rand.randrange(20)))
+        if rand.random() < 0.3:
+            text += '\n' + ''.join(rand.choice('ab ')
+                                   for c in range(rand.randrange(16)))
+        yield rand.randrange(16), rand.randrange(2), text
+
+
+def test_same_screen_fewer_bytes():
+    fbBus    = SMBusEmulator(realtime=False)
+    plainBus = SMBusEmulator(realtime=False)
+    fb    = Adafruit_CharLCDPlate(bus=fbBus)
+    plain = Adafruit_CharLCDPlate(bus=plainBus)
+    fb.framebuffer()
+    for col, row, text in frames(500):
+        sent, saved = fb.fbSent, fb.fbSaved
+        for lcd in (fb, plain):
+            lcd.beginFrame()
+            lcd.setCursor(col, row)
+            lcd.message(text)
+            lcd.endFrame()
+        assert fbBus.screen() == plainBus.screen()
+        # Sent and saved add up to what plain mode sent, setCursor() too
+        assert (fb.fbSent - sent) + (fb.fbSaved - saved) == plain.frameBytes
+        assert fb.fbSaved >= saved
+    fbBus.assertIdle()
@@ -0,0 +1,97 @@
+# test_inputsources.py
+#
+# Input sources fed through a pipe or socketpair() in place of the
+# device, run through an InputMux.
+import os
+import socket
+from queue import Queue
+
+from buttons import Gestures, PRESS, RELEASE, CLICK, CHORD
+from InputSources import (EvdevSource, LircSource, InputMux, EV_KEY,
+                          EV_REL, KEY_UP, KEY_DOWN, KEY_ENTER, KEY_VOLUMEUP,
+                          REL_DIAL, SELECT, UP, DOWN)
+
+
+def drain(queue):
+    events = []
+    while not queue.empty():
+        event = queue.get()
+        events.append((event.kind, event.buttons))
+    return events
+
+
+def evdev():
+    r, w   = os.pipe()
+    queue  = Queue()
+    source = EvdevSource(r, gestures=Gestures(doubles=0))
+    return InputMux(queue, [source]), queue, w
+
+
+def test_evdev_key():
+    mux, queue, w = evdev()
+    os.write(w, EvdevSource.pack(EV_KEY, KEY_UP, 1))
+    mux.step(1.0)
+    os.write(w, EvdevSource.pack(EV_KEY, KEY_UP, 0))
+    mux.step(1.0)
+    mux.step(1.0)               # The release waits out the debounce
+    assert drain(queue) == [(PRESS, UP), (RELEASE, UP), (CLICK, UP)]
+    assert mux.held() == 0
+
+
+def test_evdev_held_and_chord():
+    mux, queue, w = evdev()
+    os.write(w, EvdevSource.pack(EV_KEY, KEY_UP, 1))
+    mux.step(1.0)
+    assert mux.held() == UP
+    os.write(w, EvdevSource.pack(EV_KEY, KEY_DOWN, 1))
+    mux.step(1.0)
+    assert mux.held() == UP | DOWN
+    assert drain(queue) == [(PRESS, UP), (CHORD, UP | DOWN)]
+
+
+def test_evdev_keymap_and_partial_events():
+    # Events split across reads are put back together
+    mux, queue, w = evdev()
+    data = (EvdevSource.pack(EV_KEY, KEY_ENTER, 1) +
+            EvdevSource.pack(EV_KEY, KEY_VOLUMEUP, 1))
+    os.write(w, data[:5])
+    mux.step(1.0)
+    os.write(w, data[5:])
+    mux.step(1.0)
+    assert drain(queue) == [(CHORD, SELECT | UP)]
+
+
+def test_evdev_dial():
+    mux, queue, w = evdev()
+    os.write(w, EvdevSource.pack(EV_REL, REL_DIAL, -2))
+    mux.step(1.0)
+    assert drain(queue) == [(PRESS, DOWN), (RELEASE, DOWN),
+                            (CLICK, DOWN)] * 2
+
+
+def test_evdev_unplugged():
+    mux, queue, w = evdev()
+    os.close(w)
+    mux.step(1.0)
+    assert mux.sources == []
+
+
+def test_lirc():
+    ours, theirs = socket.socketpair()
+    queue = Queue()
+    mux   = InputMux(queue, [LircSource(ours, delay=2)])
+    theirs.sendall(b'0000000000000001 00 KEY_UP remote\n'
+                   b'0000000000000001 01 KEY_UP remote\n'
+                   b'0000000000000001 02 KEY_UP remote\n'
+                   b'0000000000000002 00 KEY_O')
+    mux.step(1.0)
+    # The repeat before 'delay' is dropped, and the unfinished line
+    # waits for the rest
+    assert drain(queue) == [(PRESS, UP), (RELEASE, UP), (CLICK, UP)] * 2
+    theirs.sendall(b'K remote\nBEGIN\nVERSION\nSUCCESS\nEND\n')
+    mux.step(1.0)
+    assert drain(queue) == [(PRESS, SELECT), (RELEASE, SELECT),
+                            (CLICK, SELECT)]
+    theirs.close()
+    mux.step(1.0)
+    assert mux.sources == []
@@ -0,0 +1,57 @@
+# test_marquee.py
+#
+# Marquee scrolling on an emulated plate: what is in view after each
+# step, and what it costs.
+from Adafruit_CharLCDPlate import Adafruit_CharLCDPlate
+from Marquee import Marquee
+from SMBusEmulator import SMBusEmulator
+
+
+def marquee(text):
+    bus = SMBusEmulator(realtime=False)
+    lcd = Adafruit_CharLCDPlate(bus=bus)
+    lcd.framebuffer()
+    m   = Marquee(lcd)
+    m.start(text)
+    return bus, lcd, m
+
+
+# What should be in view after 'steps' steps of a line going round with
+# 'loop' (the line and its gap) repeating
+def view(loop, steps, cols=16):
+    return ''.join(loop[(steps + i) % len(loop)] for i in range(cols))
+
+
+def check(line, loop, refill):
+    bus, lcd, m = marquee(line)
+    assert m.refill == refill
+    for steps in range(1, 3 * len(loop)):
+        before = bus.transactions
+        m.step()
+        assert bus.screen()[0] == view(loop, steps)
+        if not refill:
+            assert bus.transactions - before == 1
+    bus.assertIdle()
+
+
+def test_short_line():
+    # Goes round the whole of DDRAM, blank past the gap
+    line = 'A station name of 24 chr'
+    check(line, line.ljust(40), refill=False)
+
+
+def test_line_nearly_ddram_wide():
+    # 38 characters: only as much of the gap as fits, and no refill
+    line = 'Thirty-eight characters of stream titl'
+    assert len(line) == 38
+    check(line, line + '  ', refill=False)
+
+
+def test_line_ddram_wide():
+    line = 'x' * 39 + 'y'
+    check(line, line, refill=False)
+
+
+def test_long_line():
+    line = 'A stream title much too long for the DDRAM of the LCD'
+    check(line, line + Marquee.GAP, refill=True)
@@ -0,0 +1,35 @@
+# test_mixer.py
+#
+# Mixer's worker thread against a stub send() that records the volumes
+# the player would have been sent.
+from time import sleep
+
+from Mixer import Mixer
+
+
+def test_ramp_limited_by_rate():
+    sent  = []
+    mixer = Mixer(sent.append, rate=10, volume=20)
+    mixer.start()
+    for volume in range(20, 81):
+        mixer.set(volume)
+        sleep(0.002)
+    sleep(0.3)
+    assert sent[-1] == 80
+    assert len(sent) < 10
+
+
+def test_mute_fades_out_and_back():
+    sent  = []
+    mixer = Mixer(sent.append, rate=100, volume=50)
+    mixer.start()
+    mixer.mute(True, 0.05)
+    sleep(0.2)
+    assert sent[-1] == 0
+    assert sent == sorted(sent, reverse=True)
+    mixer.set(60)               # Only the volume to come back to
+    sleep(0.1)
+    assert sent[-1] == 0
+    mixer.mute(False, 0.05)
+    sleep(0.2)
+    assert sent[-1] == 60
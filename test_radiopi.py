@@ -0,0 +1,60 @@
+# test_radiopi.py
+#
+# radiopi's controls against a stub player, with the plate emulated.
+from time import sleep
+
+import radiopi
+
+
+class Player:
+    """ Stands in for MPDClient, recording the commands it is sent """
+
+    def __init__(self):
+        self.commands = []
+
+    def play(self, position=None):
+        self.commands.append(('play', position))
+
+    def setvol(self, volume):
+        self.commands.append(('setvol', volume))
+
+
+def radio(monkeypatch, station=1, stations=10):
+    monkeypatch.setattr(radiopi, 'STATION', station)
+    monkeypatch.setattr(radiopi, 'NUM_STATIONS', stations)
+    monkeypatch.setattr(radiopi, 'ZAP_WINDOW', 0.05)
+    monkeypatch.setattr(radiopi, 'APP', radiopi.App(bus='emulator'))
+    radiopi.APP.mpd = Player()
+    radiopi.APP.tuner.start()
+    return radiopi.APP
+
+
+def test_zapping_burst_plays_once(monkeypatch):
+    # Five stations along, one play: of the last one
+    app = radio(monkeypatch, station=3)
+    for press in range(5):
+        radiopi.chanUp()
+        sleep(0.005)
+    assert radiopi.STATION == 8
+    sleep(0.3)
+    assert app.mpd.commands == [('play', 7)]
+    assert app.tuner.dropped == 4
+
+
+def test_zapping_back_and_forth(monkeypatch):
+    app = radio(monkeypatch, station=1)
+    radiopi.chanDown()           # Round to the last station
+    radiopi.chanDown()
+    radiopi.chanUp()
+    assert radiopi.STATION == 10
+    sleep(0.3)
+    assert app.mpd.commands == [('play', 9)]
+
+
+def test_zapping_back_to_the_start(monkeypatch):
+    # Back where it started before the window closed: nothing to play
+    app = radio(monkeypatch, station=4)
+    radiopi.chanUp()
+    radiopi.chanDown()
+    sleep(0.3)
+    assert app.mpd.commands == []
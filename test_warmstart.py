@@ -0,0 +1,76 @@
+# test_warmstart.py
+#
+# Restarting the plate driver on a plate the last run left configured
+# (see Adafruit_CharLCDPlate's 'state'), on an SMBusEmulator.
+from Adafruit_CharLCDPlate import Adafruit_CharLCDPlate
+from SMBusEmulator import SMBusEmulator
+
+HEART = Adafruit_CharLCDPlate.glyph([0b00000, 0b01010, 0b11111, 0b11111,
+                                     0b01110, 0b00100, 0b00000, 0b00000])
+
+
+def first(bus, state, timed):
+    lcd = Adafruit_CharLCDPlate(bus=bus, timed=timed, state=state)
+    lcd.begin(16, 2)
+    lcd.backlight(lcd.TEAL)
+    lcd.message('Station ' + HEART + '\nPlaying')
+    return lcd
+
+
+def restart(bus, state, timed):
+    lcd = Adafruit_CharLCDPlate(bus=bus, timed=timed, state=state)
+    lcd.begin(16, 2)
+    return lcd
+
+
+def check_warm(tmp_path, timed, realtime):
+    state = str(tmp_path / 'lcd')
+    bus   = SMBusEmulator(realtime=realtime)
+    first(bus, state, timed)
+    slot  = ord(bus.screen()[0][8])
+    lcd   = restart(bus, state, timed)
+    assert lcd.warm
+    bus.assertScreen('Station ' + chr(slot), 'Playing')
+    assert bus.backlight() == lcd.TEAL
+    # The glyph is still in the LCD, and known to be there
+    lcd.message('\n' + HEART)
+    assert lcd.cgramUploads == 0
+    bus.assertScreen('Station ' + chr(slot), chr(slot))
+    bus.assertIdle()
+
+
+def test_warm_polled(tmp_path):
+    check_warm(tmp_path, timed=False, realtime=False)
+
+
+def test_warm_timed(tmp_path):
+    # Emulated time is enough: timed mode waits by the emulator's clock
+    check_warm(tmp_path, timed=True, realtime=False)
+
+
+def test_warm_timed_real_time(tmp_path):
+    check_warm(tmp_path, timed=True, realtime=True)
+
+
+def test_cold_after_stop(tmp_path):
+    state = str(tmp_path / 'lcd')
+    bus   = SMBusEmulator(realtime=False)
+    first(bus, state, True).stop()
+    lcd   = restart(bus, state, True)
+    assert not lcd.warm
+    assert bus.screen() == [' ' * 16] * 2
+    bus.assertIdle()
+
+
+def test_cold_without_state(tmp_path):
+    # Configured, but with no saved frame to paint back: cleared
+    bus = SMBusEmulator(realtime=False)
+    first(bus, str(tmp_path / 'lcd'), True)
+    restart(bus, str(tmp_path / 'missing'), True)
+    assert bus.screen() == [' ' * 16] * 2
+    bus.assertIdle()
+
+
+def test_cold_on_fresh_bus(tmp_path):
+    lcd = restart(SMBusEmulator(realtime=False), str(tmp_path / 'lcd'), True)
+    assert not lcd.warm
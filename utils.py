@@ -1,7 +1,8 @@
 import time
 
 
-# Current time in milli seconds. Taken from
+# Current time in milli seconds, for measuring intervals (monotonic, so
+# it can't jump when the clock is set).  Taken from
 # http://stackoverflow.com/questions/5998245/get-current-time-in-milliseconds-in-python
 def millis():
-    return int(round(time_.time() * 1000))
+    return int(round(time.monotonic() * 1000))